@@ -5,6 +5,7 @@ from pathlib import Path
 from tap import Tap
 
 from labby.cli.core import ALL_COMMANDS, Command
+from labby.utils import auto_discover_drivers
 
 
 # pyre-ignore[13]: command is unitialized
@@ -25,6 +26,8 @@ def _auto_discover_commands() -> None:
 def main() -> None:
     sys.path.append(os.getcwd())
     _auto_discover_commands()
+    if os.environ.get("LABBY_EAGER_DRIVERS") == "1":
+        auto_discover_drivers()
 
     if len(sys.argv) > 1 and Command.is_valid(sys.argv[1]):
         rc = Command.run(sys.argv[1], sys.argv[2:])
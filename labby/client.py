@@ -1,23 +1,31 @@
-from typing import cast
+import asyncio
+from typing import Iterable, List
 
 from pynng import Req0
 
-from labby.server import ServerRequest, TNonOptionalResponse
+from labby.server import HALT_MESSAGE, ServerRequest, TNonOptionalResponse
 from labby.server.requests.device_info import DeviceInfoRequest, DeviceInfoResponse
 from labby.server.requests.experiment_status import (
     ExperimentStatusRequest,
     ExperimentStatusResponse,
 )
-from labby.server.requests.halt import HaltRequest
 from labby.server.requests.hello import HelloWorldRequest
 from labby.server.requests.list_devices import ListDevicesRequest, ListDevicesResponse
 from labby.server.requests.run_sequence import RunSequenceRequest
+from labby.utils.msgpack import decode
 
 
 DEFAULT_CLIENT_TIMEOUT = 1000
 
 
-class Client:
+def _decode_response(
+    request: ServerRequest[TNonOptionalResponse], response: bytes
+) -> TNonOptionalResponse:
+    # pyre-ignore[6]: the response type is only known at runtime
+    return decode(response, request._RESPONSE_TYPE)
+
+
+class _BaseClient:
     req: Req0
 
     def __init__(self, address: str) -> None:
@@ -27,24 +35,22 @@ class Client:
             send_timeout=DEFAULT_CLIENT_TIMEOUT,
         )
 
+    def close(self) -> None:
+        self.req.close()
+
+
+class Client(_BaseClient):
     def _send(self, request: ServerRequest[None]) -> None:
-        self.req.send(
-            type(request).__name__.encode() + b":" + cast(bytes, request.to_msgpack())
-        )
+        self.req.send(request.to_envelope())
 
     def _query(
         self, request: ServerRequest[TNonOptionalResponse]
     ) -> TNonOptionalResponse:
-        # FIXME: ughh I can't get rid of this copypasta
-        self.req.send(
-            type(request).__name__.encode() + b":" + cast(bytes, request.to_msgpack())
-        )
-        response_type = request.get_response_type()
-        response = self.req.recv()
-        return response_type.from_msgpack(response)
+        self.req.send(request.to_envelope())
+        return _decode_response(request, self.req.recv())
 
     def halt(self) -> None:
-        self._send(HaltRequest())
+        self.req.send(HALT_MESSAGE)
 
     def hello(self) -> str:
         return self._query(HelloWorldRequest()).content
@@ -61,5 +67,38 @@ class Client:
     def experiment_status(self) -> ExperimentStatusResponse:
         return self._query(ExperimentStatusRequest())
 
-    def close(self) -> None:
-        self.req.close()
+
+class AsyncClient(_BaseClient):
+    async def _send(self, request: ServerRequest[None]) -> None:
+        await self.req.asend(request.to_envelope())
+
+    async def _query(
+        self, request: ServerRequest[TNonOptionalResponse]
+    ) -> TNonOptionalResponse:
+        await self.req.asend(request.to_envelope())
+        return _decode_response(request, await self.req.arecv())
+
+    async def halt(self) -> None:
+        await self.req.asend(HALT_MESSAGE)
+
+    async def hello(self) -> str:
+        return (await self._query(HelloWorldRequest())).content
+
+    async def list_devices(self) -> ListDevicesResponse:
+        return await self._query(ListDevicesRequest())
+
+    async def device_info(self, device_name: str) -> DeviceInfoResponse:
+        return await self._query(DeviceInfoRequest(device_name=device_name))
+
+    async def run_sequence(self, sequence_filename: str) -> None:
+        await self._send(RunSequenceRequest(sequence_filename))
+
+    async def experiment_status(self) -> ExperimentStatusResponse:
+        return await self._query(ExperimentStatusRequest())
+
+
+async def list_devices_from_all(
+    clients: Iterable[AsyncClient],
+) -> List[ListDevicesResponse]:
+    # queries all servers at once, so it only takes as long as the slowest one
+    return list(await asyncio.gather(*(client.list_devices() for client in clients)))
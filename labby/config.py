@@ -1,37 +1,84 @@
-from typing import Sequence
-
-import strictyaml
-from strictyaml import Any, Enum, Map, MapPattern, Seq, Str
+import os
+import pickle
+import sys
+from functools import cached_property, partial
+from typing import Any, Dict, Sequence, Union
 
 from labby.hw.core import Device
+from labby.utils.cache import load_with_cache, memoize_copies
+from labby.utils.yaml import load_yaml_as_strings
+
+
+_DEVICE_KEYS = {"name", "type", "driver", "args"}
+_DEVICE_TYPES = {"power_supply"}
+
+
+def _validate_config(doc: object) -> Dict[str, Any]:
+    if not isinstance(doc, dict) or doc.keys() != {"devices"}:
+        raise ValueError("Config must have a single top-level `devices` key")
+    if not isinstance(doc["devices"], list):
+        raise ValueError("`devices` must be a list of devices")
+    for device in doc["devices"]:
+        if not isinstance(device, dict) or device.keys() != _DEVICE_KEYS:
+            raise ValueError(f"Devices must have exactly the keys {_DEVICE_KEYS}")
+        if not isinstance(device["name"], str):
+            raise ValueError("`name` must be a string")
+        if device["type"] not in _DEVICE_TYPES:
+            raise ValueError(f"`type` must be one of {_DEVICE_TYPES}")
+        if not isinstance(device["driver"], str):
+            raise ValueError("`driver` must be a string")
+        args = device["args"]
+        if not (isinstance(args, dict) and all(isinstance(key, str) for key in args)):
+            raise ValueError("`args` must be a mapping with string keys")
+    return doc
 
 
-SCHEMA = Map(
-    {
-        "devices": Seq(
-            Map(
-                {
-                    "name": Str(),
-                    "type": Enum("power_supply"),
-                    "driver": Str(),
-                    "args": MapPattern(Str(), Any()),
-                }
-            )
-        ),
-    }
-)
+@memoize_copies(maxsize=32)
+def _load_config(yaml_contents: Union[bytes, str]) -> Dict[str, Any]:
+    # device args are converted to the types their drivers expect, so they are
+    # kept as the strings written in the config instead of guessing their types
+    return _validate_config(load_yaml_as_strings(yaml_contents))
 
 
 class Config:
-    config: strictyaml.YAML
+    config: Dict[str, Any]
     devices: Sequence[Device]
 
-    def __init__(self, yaml_contents: str) -> None:
-        self.config = strictyaml.load(yaml_contents, SCHEMA)
+    def __init__(self, yaml_contents: Union[bytes, str]) -> None:
+        self._load(_load_config(yaml_contents))
+
+    def _load(self, config: Dict[str, Any]) -> None:
+        self.config = config
         self.devices = [
-            Device.create(device["name"], device["driver"].data, device["args"].data)
+            Device.create(device["name"], sys.intern(device["driver"]), device["args"])
             for device in self.config["devices"]
         ]
 
+    @classmethod
+    def from_file(cls, filename: str) -> "Config":
+        data = load_with_cache(
+            filename,
+            _load_config,
+            cache_filename=f"{filename}.cache.pkl",
+            dumps=partial(pickle.dumps, protocol=pickle.HIGHEST_PROTOCOL),
+            loads=pickle.loads,
+            enabled=os.environ.get("LABBY_CONFIG_CACHE") != "0",
+        )
+        config = cls.__new__(cls)
+        config._load(data)
+        return config
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        _load_config.cache_clear()
+
     def get_devices(self) -> Sequence[Device]:
         return self.devices
+
+    @cached_property
+    def devices_by_name(self) -> Dict[str, Device]:
+        devices_by_name: Dict[str, Device] = {}
+        for device in self.devices:
+            # the first device wins if more than one has the same name
+            devices_by_name.setdefault(device.name, device)
+        return devices_by_name
@@ -74,14 +74,10 @@ class Experiment(Generic[TInputParameters, TOutputData], ABC):
 
     def get_power_supply(self, name: str) -> PowerSupply:
         config = none_throws(self.config)
-        try:
-            return next(
-                d
-                for d in config.get_devices()
-                if isinstance(d, PowerSupply) and d.name == name
-            )
-        except StopIteration:
+        device = config.devices_by_name.get(name)
+        if not isinstance(device, PowerSupply):
             raise Exception(f"Power Supply not found: {name}")
+        return device
 
     @abstractmethod
     def start(self) -> None:
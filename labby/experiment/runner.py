@@ -1,18 +1,18 @@
 import os
 import threading
 import time
-from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
 from typing import List
 
+import msgspec
 import pandas
-from mashumaro import DataClassMessagePackMixin
 from pynng import Message, NNGException, Pub0
 
 from labby.config import Config
 from labby.experiment import Experiment, BaseInputParameters, BaseOutputData
 from labby.experiment.sequence import ExperimentSequence
+from labby.utils.msgpack import encode
 
 
 _ADDRESS = "inproc://experiment_runner"
@@ -24,8 +24,7 @@ class ExperimentState(Enum):
     FINISHED = "FINISHED"
 
 
-@dataclass(frozen=True)
-class ExperimentStatus(DataClassMessagePackMixin):
+class ExperimentStatus(msgspec.Struct, frozen=True):
     name: str
     state: ExperimentState
     progress: float
@@ -34,8 +33,7 @@ class ExperimentStatus(DataClassMessagePackMixin):
         return self.state == ExperimentState.FINISHED
 
 
-@dataclass(frozen=True)
-class ExperimentSequenceStatus(DataClassMessagePackMixin):
+class ExperimentSequenceStatus(msgspec.Struct, frozen=True):
     experiments: List[ExperimentStatus]
 
     def is_finished(self) -> bool:
@@ -80,7 +78,7 @@ class ExperimentRunner(threading.Thread):
                 progress=progress,
             )
 
-            msg = Message(self.sequence_status.to_msgpack())
+            msg = Message(encode(self.sequence_status))
             self.pub.send_msg(msg, block=False)
         except NNGException:
             pass
@@ -133,7 +131,9 @@ class ExperimentRunner(threading.Thread):
             output_dir = self._get_output_directory()
             os.makedirs(output_dir, exist_ok=True)
             with open(output_dir / f"{experiment.name}.csv", "w") as fd:
-                dataframe.to_csv(fd, index=False)
+                # render the whole file first so it's written in one go rather
+                # than one row at a time
+                fd.write(dataframe.to_csv(index=False))
 
             self._publish_status(
                 experiment, experiment.DURATION_IN_SECONDS, ExperimentState.FINISHED
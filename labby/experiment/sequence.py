@@ -1,38 +1,88 @@
-from typing import Sequence
+import os
+from typing import Any, Dict, Sequence, Tuple, Union
 
-import strictyaml
-from strictyaml import Any, Map, MapPattern, Optional, Seq, Str
+import msgspec
 
 from labby.experiment import BaseInputParameters, BaseOutputData, Experiment
+from labby.utils.cache import FileVersion, load_with_cache, memoize_copies
+from labby.utils.yaml import load_yaml
 
 
-SCHEMA = Map(
-    {
-        "sequence": Seq(
-            Map(
-                {
-                    "experiment_type": Str(),
-                    Optional("params"): MapPattern(Str(), Any()),
-                }
-            ),
-        ),
-    }
-)
+_EXPERIMENT_KEYS = {"experiment_type", "params"}
+
+
+def _validate_sequence(doc: object) -> Dict[str, Any]:
+    if not isinstance(doc, dict) or doc.keys() != {"sequence"}:
+        raise ValueError("Sequence must have a single top-level `sequence` key")
+    if not isinstance(doc["sequence"], list):
+        raise ValueError("`sequence` must be a list of experiments")
+    for experiment in doc["sequence"]:
+        if not isinstance(experiment, dict):
+            raise ValueError(f"Invalid experiment in sequence: {experiment}")
+        unexpected_keys = experiment.keys() - _EXPERIMENT_KEYS
+        if unexpected_keys:
+            raise ValueError(f"Unexpected keys in experiment: {unexpected_keys}")
+        if not isinstance(experiment.get("experiment_type"), str):
+            raise ValueError("`experiment_type` must be a string")
+        params = experiment.get("params")
+        if "params" in experiment and not (
+            isinstance(params, dict) and all(isinstance(key, str) for key in params)
+        ):
+            raise ValueError("`params` must be a mapping with string keys")
+    return doc
+
+
+@memoize_copies(maxsize=100)
+def _load_sequence(yaml_contents: Union[bytes, str]) -> Dict[str, Any]:
+    return _validate_sequence(load_yaml(yaml_contents))
+
+
+def _dump_sequence(data: Tuple[FileVersion, Dict[str, Any]]) -> bytes:
+    encoded = msgspec.json.encode(data)
+    # json can't hold everything yaml can (e.g. dates or infinity), so only keep
+    # the copy if it loads back to the same sequence
+    if msgspec.json.decode(encoded)[1] != data[1]:
+        raise TypeError("Sequence can't be stored as json")
+    return encoded
 
 
 class ExperimentSequence:
     filename: str
-    sequence_config: strictyaml.YAML
+    sequence_config: Dict[str, Any]
     experiments: Sequence[Experiment[BaseInputParameters, BaseOutputData]]
 
     def __init__(self, filename: str, yaml_contents: str) -> None:
         self.filename = filename
-        self.sequence_config = strictyaml.load(yaml_contents, SCHEMA)
-        self.experiments = [
+        self._load(_load_sequence(yaml_contents))
+
+    def _load(self, sequence_config: Dict[str, Any]) -> None:
+        self.sequence_config = sequence_config
+        self.experiments = tuple(
             Experiment.create(
                 experiment["experiment_type"],
                 f"{index:03d}",
-                experiment["params"].data if "params" in experiment else None,
+                experiment.get("params"),
             )
             for index, experiment in enumerate(self.sequence_config["sequence"])
-        ]
+        )
+
+    @classmethod
+    def from_file(cls, filename: str) -> "ExperimentSequence":
+        # the parsed sequence is kept in a json file next to it, which is much
+        # faster to load than yaml
+        sequence_config = load_with_cache(
+            filename,
+            _load_sequence,
+            cache_filename=f"{filename}.json",
+            dumps=_dump_sequence,
+            loads=msgspec.json.decode,
+            enabled=os.environ.get("LABBY_SEQUENCE_CACHE") != "0",
+        )
+        sequence = cls.__new__(cls)
+        sequence.filename = filename
+        sequence._load(sequence_config)
+        return sequence
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        _load_sequence.cache_clear()
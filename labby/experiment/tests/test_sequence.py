@@ -1,5 +1,9 @@
+import os
+import tempfile
 from dataclasses import dataclass
 from unittest import TestCase
+from unittest.mock import patch
+
 
 from labby.experiment import (
     BaseInputParameters,
@@ -7,6 +11,7 @@ from labby.experiment import (
     Experiment,
 )
 from labby.experiment.sequence import ExperimentSequence
+from labby.utils.yaml import load_yaml
 
 
 @dataclass(frozen=True)
@@ -34,7 +39,19 @@ class TestExperiment(Experiment[InputParameters, OutputData]):
         pass
 
 
+SEQUENCE_YAML = """
+---
+sequence:
+  - experiment_type: labby.experiment.tests.test_sequence.TestExperiment
+    params:
+      current_in_amps: 7
+"""
+
+
 class ExperimentSequenceTest(TestCase):
+    def setUp(self) -> None:
+        ExperimentSequence.clear_cache()
+
     def test_parsing(self) -> None:
         sequence = ExperimentSequence(
             "sequences/test.yaml",
@@ -62,3 +79,84 @@ sequence:
         assert isinstance(second_experiment, TestExperiment)
         self.assertAlmostEqual(second_experiment.params.current_in_amps, 3)
         self.assertAlmostEqual(second_experiment.params.voltage_in_volts, 2)
+
+    def test_invalid_sequence(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Unexpected keys in experiment"):
+            ExperimentSequence(
+                "sequences/test.yaml",
+                """
+---
+sequence:
+  - experiment_type: labby.experiment.tests.test_sequence.TestExperiment
+    foo: bar
+""",
+            )
+
+    def test_parsed_sequences_are_cached(self) -> None:
+        with patch("labby.experiment.sequence.load_yaml", wraps=load_yaml) as load:
+            first_sequence = ExperimentSequence("sequences/test.yaml", SEQUENCE_YAML)
+            second_sequence = ExperimentSequence("sequences/test.yaml", SEQUENCE_YAML)
+            load.assert_called_once()
+
+            ExperimentSequence.clear_cache()
+            ExperimentSequence("sequences/test.yaml", SEQUENCE_YAML)
+            self.assertEqual(load.call_count, 2)
+
+        self.assertEqual(
+            first_sequence.sequence_config, second_sequence.sequence_config
+        )
+        self.assertIsNot(
+            first_sequence.sequence_config, second_sequence.sequence_config
+        )
+        self.assertIsNot(first_sequence.experiments[0], second_sequence.experiments[0])
+
+
+class ExperimentSequenceFileTest(TestCase):
+    def setUp(self) -> None:
+        ExperimentSequence.clear_cache()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "test.yaml")
+        with open(self.filename, "w") as sequence_file:
+            sequence_file.write(SEQUENCE_YAML)
+
+    def test_parsed_sequence_is_stored_as_json(self) -> None:
+        with patch("labby.experiment.sequence.load_yaml", wraps=load_yaml) as load_mock:
+            first_sequence = ExperimentSequence.from_file(self.filename)
+            ExperimentSequence.clear_cache()
+            second_sequence = ExperimentSequence.from_file(self.filename)
+        load_mock.assert_called_once()
+        self.assertTrue(os.path.exists(f"{self.filename}.json"))
+        self.assertEqual(second_sequence.filename, self.filename)
+        self.assertEqual(
+            first_sequence.sequence_config, second_sequence.sequence_config
+        )
+        self.assertEqual(len(second_sequence.experiments), 1)
+        self.assertEqual(
+            second_sequence.experiments[0].params,
+            InputParameters(current_in_amps=7),
+        )
+
+    def test_json_is_ignored_when_sequence_changes(self) -> None:
+        ExperimentSequence.from_file(self.filename)
+        with open(self.filename, "w") as sequence_file:
+            sequence_file.write(SEQUENCE_YAML.replace("7", "8.5"))
+        sequence = ExperimentSequence.from_file(self.filename)
+        self.assertEqual(
+            sequence.experiments[0].params, InputParameters(current_in_amps=8.5)
+        )
+
+    def test_json_is_only_kept_if_it_matches_the_sequence(self) -> None:
+        with open(self.filename, "w") as sequence_file:
+            sequence_file.write(SEQUENCE_YAML.replace("7", ".inf"))
+        first_sequence = ExperimentSequence.from_file(self.filename)
+        ExperimentSequence.clear_cache()
+        second_sequence = ExperimentSequence.from_file(self.filename)
+        self.assertFalse(os.path.exists(f"{self.filename}.json"))
+        self.assertEqual(
+            first_sequence.sequence_config, second_sequence.sequence_config
+        )
+        self.assertEqual(
+            second_sequence.experiments[0].params,
+            InputParameters(current_in_amps=float("inf")),
+        )
@@ -1,11 +1,46 @@
+import contextlib
 import inspect
+import sys
 from abc import ABC, abstractmethod
 from enum import Enum
+from importlib import import_module
 from types import TracebackType
-from typing import Any, Dict, Optional, Type
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    ContextManager,
+    Dict,
+    Optional,
+    Tuple,
+    Type,
+    get_type_hints,
+)
 
 
 ALL_DRIVERS: Dict[str, Type["Device"]] = {}
+_CONSTRUCTORS: Dict[
+    Tuple[Type["Device"], Tuple[str, ...]], Callable[[Dict[str, Any]], "Device"]
+] = {}
+
+
+def _build_constructor(
+    klass: Type["Device"],
+    arg_types: Dict[str, Callable[[Any], Any]],
+    arg_names: Tuple[str, ...],
+) -> Callable[[Dict[str, Any]], "Device"]:
+    for arg_name in arg_names:
+        if arg_name not in arg_types:
+            raise TypeError(f"{klass.__name__} got an unexpected argument {arg_name}")
+    # every name is a parameter of klass.__init__, so it is safe to put them
+    # in the generated source
+    arguments = ", ".join(
+        f"{arg_name}=arg_types[{arg_name!r}](args[{arg_name!r}])"
+        for arg_name in arg_names
+    )
+    namespace: Dict[str, Any] = {"klass": klass, "arg_types": arg_types}
+    exec(f"def construct(args):\n    return klass({arguments})\n", namespace)
+    return namespace["construct"]
 
 
 class DeviceType(Enum):
@@ -22,16 +57,38 @@ class Device(ABC):
     name: str = "unnamed device"
     device_type: DeviceType
 
+    _ARG_TYPES: ClassVar[Optional[Dict[str, Callable[[Any], Any]]]] = None
+    _DRIVER_KEY: ClassVar[str]
+
     def __init_subclass__(cls) -> None:
-        ALL_DRIVERS[f"{cls.__module__}.{cls.__name__}"] = cls
+        # interned so lookups with interned driver names (see Config) can
+        # short-circuit on identity
+        driver = sys.intern(f"{cls.__module__}.{cls.__name__}")
+        assert driver not in ALL_DRIVERS, f"Driver {driver} was registered twice"
+        cls._DRIVER_KEY = driver
+        ALL_DRIVERS[driver] = cls
+        try:
+            cls._ARG_TYPES = {
+                key: arg_type
+                for key, arg_type in get_type_hints(cls.__init__).items()
+                if key != "return"
+            }
+        except (NameError, TypeError):
+            # unresolvable annotations, Device.create falls back to inspect
+            cls._ARG_TYPES = None
 
     @abstractmethod
     def open(self) -> None:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def close(self) -> None:
-        raise NotImplementedError
+        ...
+
+    def lock(self) -> ContextManager[object]:
+        # held by callers from open to close, so devices that share something
+        # (e.g. a serial port) aren't used at the same time
+        return contextlib.nullcontext()
 
     def __enter__(self) -> "Device":
         self.open()
@@ -48,17 +105,27 @@ class Device(ABC):
 
     @abstractmethod
     def test_connection(self) -> None:
-        raise NotImplementedError
+        ...
 
     @classmethod
     def create(cls, name: str, driver: str, args: Dict[str, Any]) -> "Device":
+        if driver not in ALL_DRIVERS:
+            # drivers register themselves when their module is imported, so
+            # only import the module of the driver that is actually requested
+            import_module(driver.rsplit(".", 1)[0])
         klass = ALL_DRIVERS[driver]
-        signature = inspect.signature(klass)
-        typed_args = {
-            key: signature.parameters[key].annotation(value)
-            for key, value in args.items()
-        }
-        # pyre-ignore[45]: Cannot instantiate abstract class Device
-        device = klass(**typed_args)
+        key = (klass, tuple(sorted(args.keys())))
+        constructor = _CONSTRUCTORS.get(key)
+        if constructor is None:
+            arg_types = klass._ARG_TYPES
+            if arg_types is None:
+                signature = inspect.signature(klass)
+                arg_types = {
+                    key: parameter.annotation
+                    for key, parameter in signature.parameters.items()
+                }
+            constructor = _build_constructor(klass, arg_types, key[1])
+            _CONSTRUCTORS[key] = constructor
+        device = constructor(args)
         device.name = name
         return device
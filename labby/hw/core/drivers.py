@@ -0,0 +1,9 @@
+from typing import Tuple
+
+
+# modules that define drivers, so they can be imported without walking the
+# filesystem. keep this in sync when adding a new driver
+DRIVER_MODULES: Tuple[str, ...] = (
+    "labby.hw.tdklambda.power_supply",
+    "labby.hw.virtual.power_supply",
+)
@@ -18,36 +18,36 @@ class PowerSupply(Device, ABC):
 
     @abstractmethod
     def get_mode(self) -> PowerSupplyMode:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def is_output_on(self) -> bool:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def set_output_on(self, is_on: bool) -> None:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def get_target_voltage(self) -> float:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def get_actual_voltage(self) -> float:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def get_target_current(self) -> float:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def get_actual_current(self) -> float:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def set_target_voltage(self, voltage: float) -> None:
-        raise NotImplementedError
+        ...
 
     @abstractmethod
     def set_target_current(self, current: float) -> None:
-        raise NotImplementedError
+        ...
@@ -1,17 +1,19 @@
 import fcntl
-import queue
+import logging
 import threading
 import time
-import uuid
 from abc import ABC
+from collections import deque
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, Optional, Type, TypeVar, Union
+from typing import ContextManager, Deque, Dict, List, Optional
 
 from pyre_extensions import none_throws
 
 from serial import PARITY_NONE, Serial
 
+from labby.hw.core.exceptions import HardwareIOError
+
 
 class SerialDevice(ABC):
     WAIT_TIME_AFTER_WRITE_MS: float = 0.0
@@ -46,10 +48,13 @@ class SerialDevice(ABC):
         )
 
     def _write(self, msg: bytes) -> None:
-        self.serial_controller.write(msg)
+        self.serial_controller.write(msg, owner=self)
 
     def _query(self, msg: bytes) -> str:
-        return self.serial_controller.query(msg)
+        return self.serial_controller.query(msg, owner=self)
+
+    def flush(self) -> None:
+        self.serial_controller.flush(owner=self)
 
     def open(self) -> None:
         serial_controller = SerialController.get_or_create(
@@ -62,21 +67,48 @@ class SerialDevice(ABC):
             timeout_ms=self.timeout_ms,
             wait_time_after_write_ms=self.WAIT_TIME_AFTER_WRITE_MS,
         )
-        if not serial_controller.is_alive():
-            serial_controller.start()
         self._serial_controller = serial_controller
         self._on_open()
+        self.flush()
 
     def close(self) -> None:
-        self.serial_controller.close()
+        self.serial_controller.close(owner=self)
+
+    def lock(self) -> ContextManager[object]:
+        # devices on the same port may pick which unit they talk to with a
+        # stateful write (e.g. ZUPs), so only one of them can be used at a time
+        return get_port_lock(self.port)
 
     def _on_open(self) -> None:
         pass
 
 
+logger: logging.Logger = logging.getLogger(__name__)
+
+MAX_COALESCED_WRITES = 16
 REGISTRY_LOCK = threading.Lock()
 SERIAL_CONTROLLERS: Dict[str, "SerialController"] = {}
 
+PORT_LOCKS: Dict[str, ContextManager[object]] = {}
+
+_THREAD_LOCAL = threading.local()
+
+
+def get_port_lock(port: str) -> ContextManager[object]:
+    with REGISTRY_LOCK:
+        return PORT_LOCKS.setdefault(port, threading.RLock())
+
+
+def _get_thread_event() -> threading.Event:
+    # each thread waits on at most one job at a time, so it can keep reusing
+    # the same event instead of allocating a new one per job
+    try:
+        return _THREAD_LOCAL.event
+    except AttributeError:
+        event = threading.Event()
+        _THREAD_LOCAL.event = event
+        return event
+
 
 class SerialControllerJobPriority(Enum):
     HIGH = 0
@@ -87,31 +119,43 @@ class SerialControllerJobType(Enum):
     WRITE = 0
     QUERY = 1
     CLOSE = 2
+    FLUSH = 3
 
 
-@dataclass(frozen=True, order=True)
+# jobs are ordered by the per-priority queues they are in, so they never need
+# to be compared with each other
+@dataclass(eq=False)
 class SerialControllerJob:
-    condition: threading.Condition = field(init=False, compare=False)
-    uuid: str = field(init=False, compare=False)
-    type: SerialControllerJobType = field(compare=False)
-    message: bytes = field(default=b"", compare=False)
+    done: Optional[threading.Event] = field(init=False)
+    type: SerialControllerJobType
+    message: bytes = b""
     priority: SerialControllerJobPriority = SerialControllerJobPriority.LOW
+    fire_and_forget: bool = False
+    # the device that enqueued the job, which is the only one that gets to see
+    # the errors of its fire and forget writes
+    owner: Optional[object] = None
+    result: Optional[str] = field(default=None, init=False)
+    exception: Optional[Exception] = field(default=None, init=False)
 
     def __post_init__(self) -> None:
-        object.__setattr__(self, "condition", threading.Condition())
-        object.__setattr__(self, "uuid", str(uuid.uuid4()))
-
-
-TResult = TypeVar("TResult")
+        # nobody waits on fire and forget jobs, and they must not wake up the
+        # thread that enqueued them while it waits on a later job
+        self.done = None if self.fire_and_forget else _get_thread_event()
 
 
 class SerialController(threading.Thread):
     port: str
     serial: Serial
-    job_queue: "queue.PriorityQueue[SerialControllerJob]"
-    job_results: Dict[str, Union[str, Exception]]
+    job_queues: Dict[SerialControllerJobPriority, Deque[SerialControllerJob]]
+    job_queue_lock: threading.Lock
+    job_queue_not_empty: threading.Event
     num_clients: int
     wait_time_after_write_ms: float
+    _next_write_allowed: float
+    _read_buffer: bytearray
+    _deferred_exceptions: Dict[object, Exception]
+    _running: bool
+    _opened: bool
 
     def __init__(
         self,
@@ -139,10 +183,19 @@ class SerialController(threading.Thread):
         self.serial.timeout = timeout_ms / 1000.0 if timeout_ms else None
 
         self.wait_time_after_write_ms = wait_time_after_write_ms
-
-        self.job_queue = queue.PriorityQueue()
-        self.job_results = {}
+        self._next_write_allowed = 0.0
+        self._read_buffer = bytearray()
+        self._deferred_exceptions = {}
+
+        # one FIFO per priority, kept in the order they should be served
+        self.job_queues = {
+            priority: deque() for priority in SerialControllerJobPriority
+        }
+        self.job_queue_lock = threading.Lock()
+        self.job_queue_not_empty = threading.Event()
         self.num_clients = 0
+        self._running = True
+        self._opened = False
 
     @classmethod
     def get_or_create(
@@ -173,82 +226,190 @@ class SerialController(threading.Thread):
                     timeout_ms=timeout_ms,
                     wait_time_after_write_ms=wait_time_after_write_ms,
                 )
+                # started while still holding the lock, so other threads never
+                # see a registered controller that isn't running yet
+                serial_controller.start()
                 SERIAL_CONTROLLERS[port] = serial_controller
             serial_controller.num_clients += 1
             return serial_controller
 
-    def _run_and_wait(self, job: SerialControllerJob) -> None:
-        with job.condition:
-            self.job_queue.put(job)
-            job.condition.wait()
+    def _enqueue(self, job: SerialControllerJob) -> None:
+        if not self._running:
+            # nothing would ever run the job, and fire and forget writes would
+            # be silently dropped
+            raise HardwareIOError(f"Serial port {self.port} is already closed")
+        with self.job_queue_lock:
+            self.job_queues[job.priority].append(job)
+            self.job_queue_not_empty.set()
+
+    def _dequeue_nowait(
+        self, only_writes: bool = False
+    ) -> Optional[SerialControllerJob]:
+        with self.job_queue_lock:
+            for jobs in self.job_queues.values():
+                if jobs:
+                    if (
+                        only_writes
+                        and jobs[0].type is not SerialControllerJobType.WRITE
+                    ):
+                        return None
+                    return jobs.popleft()
+            self.job_queue_not_empty.clear()
+            return None
+
+    def _dequeue(self) -> SerialControllerJob:
+        while True:
+            job = self._dequeue_nowait()
+            if job is not None:
+                return job
+            self.job_queue_not_empty.wait()
+
+    def _run_and_wait(self, job: SerialControllerJob) -> Optional[str]:
+        done = none_throws(job.done)
+        done.clear()
+        self._enqueue(job)
+        done.wait()
+        if job.exception is not None:
+            raise job.exception
+        return job.result
+
+    def write(self, message: bytes, owner: Optional[object] = None) -> None:
+        # writes don't have a response, so there is no need to wait for them.
+        # if they fail, the error is raised by the owner's next query or flush
+        job = SerialControllerJob(
+            type=SerialControllerJobType.WRITE,
+            message=message,
+            fire_and_forget=True,
+            owner=owner,
+        )
+        self._enqueue(job)
 
-    def _read_result(
-        self, job: SerialControllerJob, result_type: Type[TResult]
-    ) -> TResult:
-        result = self.job_results.get(job.uuid)
-        try:
-            del self.job_results[job.uuid]
-        except KeyError:
-            pass
-        if isinstance(result, result_type):
-            return result
-        assert isinstance(result, Exception)
-        raise result
-
-    def write(self, message: bytes) -> None:
-        job = SerialControllerJob(type=SerialControllerJobType.WRITE, message=message)
-        self._run_and_wait(job)
-        return self._read_result(job, type(None))
+    def query(self, message: bytes, owner: Optional[object] = None) -> str:
+        job = SerialControllerJob(
+            type=SerialControllerJobType.QUERY, message=message, owner=owner
+        )
+        return none_throws(self._run_and_wait(job))
 
-    def query(self, message: bytes) -> str:
-        job = SerialControllerJob(type=SerialControllerJobType.QUERY, message=message)
+    def flush(self, owner: Optional[object] = None) -> None:
+        job = SerialControllerJob(type=SerialControllerJobType.FLUSH, owner=owner)
         self._run_and_wait(job)
-        return self._read_result(job, str)
 
-    def close(self) -> None:
-        job = SerialControllerJob(type=SerialControllerJobType.CLOSE)
+    def close(self, owner: Optional[object] = None) -> None:
+        job = SerialControllerJob(type=SerialControllerJobType.CLOSE, owner=owner)
         self._run_and_wait(job)
-        return self._read_result(job, type(None))
 
     def _write(self, message: bytes) -> None:
+        # only wait if the previous write was too recent, instead of always
+        # sleeping after every write
+        delay = self._next_write_allowed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
         self.serial.write(message)
-        time.sleep(self.wait_time_after_write_ms / 1000.0)
+        self._next_write_allowed = (
+            time.monotonic() + self.wait_time_after_write_ms / 1000.0
+        )
 
-    def _execute_job(self, job: SerialControllerJob) -> None:
+    def _read_line(self) -> bytes:
+        while True:
+            end = self._read_buffer.find(b"\n") + 1
+            if end > 0:
+                line = bytes(self._read_buffer[:end])
+                del self._read_buffer[:end]
+                return line
+            # read everything that is already available in one go, instead of
+            # one byte at a time like Serial.readline does
+            data = self.serial.read(self.serial.in_waiting or 1)
+            if not data:
+                # timed out, so return whatever was received so far
+                line = bytes(self._read_buffer)
+                self._read_buffer.clear()
+                return line
+            self._read_buffer += data
+
+    def _ensure_open(self) -> None:
+        if self._opened:
+            return
+        self.serial.open()
+        try:
+            fcntl.flock(self.serial, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.serial.close()
+            raise HardwareIOError(f"Serial port {self.port} is in use")
+        self._opened = True
+
+    def _coalesce_writes(self, job: SerialControllerJob) -> List[SerialControllerJob]:
+        jobs = [job]
+        if self.wait_time_after_write_ms > 0:
+            # joined writes would reach the device without the wait between
+            # them, so each one has to go out on its own
+            return jobs
+        while len(jobs) < MAX_COALESCED_WRITES:
+            # only writes can be batched, queries need their own response
+            next_job = self._dequeue_nowait(only_writes=True)
+            if next_job is None:
+                break
+            jobs.append(next_job)
+        return jobs
+
+    def _execute_jobs(self, jobs: List[SerialControllerJob]) -> None:
+        job = jobs[0]
         try:
-            if job.type == SerialControllerJobType.CLOSE:
+            if job.type is SerialControllerJobType.CLOSE:
                 with REGISTRY_LOCK:
                     self.num_clients -= 1
                     if self.num_clients == 0:
-                        del SERIAL_CONTROLLERS[self.port]
+                        if SERIAL_CONTROLLERS.get(self.port) is self:
+                            del SERIAL_CONTROLLERS[self.port]
+                        self._running = False
+                # the device is closed either way, but a failed write it never
+                # heard about (e.g. turning the output off) must not be lost
+                deferred_exception = self._deferred_exceptions.pop(job.owner, None)
+                if deferred_exception is not None:
+                    raise deferred_exception
                 return
 
-            if not self.serial.is_open:
-                self.serial.open()
-                fcntl.flock(self.serial, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if job.type is not SerialControllerJobType.WRITE:
+                deferred_exception = self._deferred_exceptions.pop(job.owner, None)
+                if deferred_exception is not None:
+                    raise deferred_exception
 
-            if job.type == SerialControllerJobType.WRITE:
-                self._write(job.message)
+            if job.type is SerialControllerJobType.FLUSH:
+                return
+
+            self._ensure_open()
+
+            if job.type is SerialControllerJobType.WRITE:
+                self._write(b"".join(write_job.message for write_job in jobs))
                 return
 
-            if job.type == SerialControllerJobType.QUERY:
+            if job.type is SerialControllerJobType.QUERY:
                 self._write(job.message)
-                response = self.serial.readline()[:-2].decode("utf-8")
-                self.job_results[job.uuid] = response
+                response = self._read_line().rstrip(b"\r\n").decode("ascii")
+                job.result = response
                 return
         except Exception as ex:
-            self.job_results[job.uuid] = ex
+            for failed_job in jobs:
+                failed_job.exception = ex
+                if failed_job.fire_and_forget:
+                    self._deferred_exceptions.setdefault(failed_job.owner, ex)
+            if any(failed_job.fire_and_forget for failed_job in jobs):
+                logger.exception(f"Failed to write to serial port {self.port}")
 
     def run(self) -> None:
         try:
-            while self.serial.port in SERIAL_CONTROLLERS.keys():
-                job = self.job_queue.get()
-                with job.condition:
-                    self._execute_job(job)
-                    job.condition.notify()
-                self.job_queue.task_done()
-
-            assert self.job_queue.empty()
+            while self._running:
+                job = self._dequeue()
+                jobs = (
+                    self._coalesce_writes(job)
+                    if job.type is SerialControllerJobType.WRITE
+                    else [job]
+                )
+                self._execute_jobs(jobs)
+                for job in jobs:
+                    if job.done is not None:
+                        job.done.set()
+
+            assert not any(self.job_queues.values())
 
         finally:
             self.serial.close()
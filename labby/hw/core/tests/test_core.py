@@ -1,5 +1,9 @@
 from unittest import TestCase
-from labby.hw.core import DeviceType
+from unittest.mock import patch
+
+from labby.hw import core
+from labby.hw.core import ALL_DRIVERS, Device, DeviceType
+from labby.hw.virtual.power_supply import PowerSupply
 
 
 class DeviceTypeTest(TestCase):
@@ -8,3 +12,49 @@ class DeviceTypeTest(TestCase):
             friendly_name = device_type.friendly_name
             self.assertIsInstance(friendly_name, str)
             self.assertGreater(len(friendly_name), 0)
+
+
+class DeviceTest(TestCase):
+    def test_drivers_are_imported_on_demand(self) -> None:
+        driver = "labby.hw.virtual.power_supply.PowerSupply"
+        with patch.dict(ALL_DRIVERS, clear=True), patch(
+            "labby.hw.core.import_module",
+            side_effect=lambda _module: ALL_DRIVERS.update({driver: PowerSupply}),
+        ) as import_module:
+            device = Device.create("psu", driver, {"load_in_ohms": "5"})
+        import_module.assert_called_once_with("labby.hw.virtual.power_supply")
+        assert isinstance(device, PowerSupply)
+        self.assertEqual(device.name, "psu")
+        self.assertAlmostEqual(device.load_in_ohms, 5.0)
+
+    def test_driver_key(self) -> None:
+        driver = "labby.hw.virtual.power_supply.PowerSupply"
+        self.assertEqual(PowerSupply._DRIVER_KEY, driver)
+        self.assertIs(ALL_DRIVERS[driver], PowerSupply)
+
+    def test_constructors_are_reused(self) -> None:
+        driver = "labby.hw.virtual.power_supply.PowerSupply"
+        with patch.dict(core._CONSTRUCTORS, clear=True), patch(
+            "labby.hw.core._build_constructor", wraps=core._build_constructor
+        ) as build_constructor:
+            first = Device.create("first", driver, {"load_in_ohms": "5"})
+            second = Device.create("second", driver, {"load_in_ohms": 3})
+        build_constructor.assert_called_once()
+        assert isinstance(first, PowerSupply) and isinstance(second, PowerSupply)
+        self.assertEqual((first.name, first.load_in_ohms), ("first", 5.0))
+        self.assertEqual((second.name, second.load_in_ohms), ("second", 3.0))
+
+    def test_unexpected_argument(self) -> None:
+        driver = "labby.hw.virtual.power_supply.PowerSupply"
+        with self.assertRaisesRegex(TypeError, "unexpected argument foo"):
+            Device.create("psu", driver, {"load_in_ohms": 5, "foo": "bar"})
+
+    def test_drivers_cannot_be_registered_twice(self) -> None:
+        with patch.dict(ALL_DRIVERS):
+            with self.assertRaisesRegex(AssertionError, "registered twice"):
+
+                class DuplicateDriver(Device):  # noqa: F811
+                    pass
+
+                class DuplicateDriver(Device):  # noqa: F811
+                    pass
@@ -1,13 +1,21 @@
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from serial import SerialException, SerialTimeoutException
 
+from labby.hw.core.exceptions import HardwareIOError
 from labby.hw.core.power_supply import (
     PowerSupply,
     PowerSupplyMode,
 )
-from labby.hw.core.serial import SerialDevice, SERIAL_CONTROLLERS
+from labby.hw.core.serial import (
+    SerialController,
+    SerialControllerJob,
+    SerialControllerJobPriority,
+    SerialControllerJobType,
+    SerialDevice,
+    SERIAL_CONTROLLERS,
+)
 from labby.tests.utils import fake_serial_port
 
 
@@ -55,6 +63,14 @@ class SerialDeviceTest(TestCase):
             with TestSerialPowerSupply("/dev/ttyUSB0", 9600) as power_supply:
                 power_supply.get_mode()
 
+    @fake_serial_port
+    def test_serial_port_in_use(self, serial_port_mock: Mock) -> None:
+        with patch("labby.hw.core.serial.fcntl.flock", side_effect=BlockingIOError):
+            with TestSerialPowerSupply("/dev/ttyUSB0", 9600) as power_supply:
+                with self.assertRaisesRegex(HardwareIOError, "is in use"):
+                    power_supply.get_mode()
+        serial_port_mock.write.assert_not_called()
+
     @fake_serial_port
     def test_write_timeout(self, serial_port_mock: Mock) -> None:
         serial_port_mock.write.side_effect = SerialTimeoutException("Timeout")
@@ -64,12 +80,103 @@ class SerialDeviceTest(TestCase):
 
     @fake_serial_port
     def test_successful_write_and_read(self, serial_port_mock: Mock) -> None:
-        serial_port_mock.readline.return_value = b"0\r\n"
+        serial_port_mock.read.return_value = b"0\r\n"
+        with TestSerialPowerSupply("/dev/ttyUSB0", 9600) as power_supply:
+            self.assertEqual(power_supply.get_mode(), PowerSupplyMode.CONSTANT_VOLTAGE)
+
+    @fake_serial_port
+    def test_read_line_terminated_by_newline(self, serial_port_mock: Mock) -> None:
+        serial_port_mock.read.return_value = b"1\n"
         with TestSerialPowerSupply("/dev/ttyUSB0", 9600) as power_supply:
+            self.assertEqual(power_supply.get_mode(), PowerSupplyMode.CONSTANT_CURRENT)
+
+    @fake_serial_port
+    def test_write_errors_are_raised_by_next_query(
+        self, serial_port_mock: Mock
+    ) -> None:
+        serial_port_mock.write.side_effect = [SerialTimeoutException("Timeout"), None]
+        serial_port_mock.read.return_value = b"0\r\n"
+        with TestSerialPowerSupply("/dev/ttyUSB0", 9600) as power_supply:
+            with self.assertLogs("labby.hw.core.serial", level="ERROR"):
+                power_supply._write(b":foo;")
+                with self.assertRaises(SerialTimeoutException):
+                    power_supply.get_mode()
             self.assertEqual(power_supply.get_mode(), PowerSupplyMode.CONSTANT_VOLTAGE)
 
+    @fake_serial_port
+    def test_flush_raises_write_errors(self, serial_port_mock: Mock) -> None:
+        serial_port_mock.write.side_effect = SerialTimeoutException("Timeout")
+        with TestSerialPowerSupply("/dev/ttyUSB0", 9600) as power_supply:
+            with self.assertLogs("labby.hw.core.serial", level="ERROR"):
+                power_supply._write(b":foo;")
+                with self.assertRaises(SerialTimeoutException):
+                    power_supply.flush()
+            # the error is only raised once
+            power_supply.flush()
+
+    @fake_serial_port
+    def test_close_raises_write_errors(self, serial_port_mock: Mock) -> None:
+        serial_port_mock.write.side_effect = SerialTimeoutException("Timeout")
+        power_supply = TestSerialPowerSupply("/dev/ttyUSB0", 9600)
+        power_supply.open()
+        with self.assertLogs("labby.hw.core.serial", level="ERROR"):
+            power_supply._write(b":OUT0;")
+            with self.assertRaises(SerialTimeoutException):
+                power_supply.close()
+        self.assertEqual(len(SERIAL_CONTROLLERS), 0)
+
+    @fake_serial_port
+    def test_write_after_close(self, _serial_port_mock: Mock) -> None:
+        power_supply = TestSerialPowerSupply("/dev/ttyUSB0", 9600)
+        power_supply.open()
+        power_supply.close()
+        with self.assertRaisesRegex(HardwareIOError, "is already closed"):
+            power_supply._write(b":OUT0;")
+
+    @fake_serial_port
+    def test_write_errors_are_only_raised_to_their_device(
+        self, serial_port_mock: Mock
+    ) -> None:
+        serial_port_mock.write.side_effect = [SerialTimeoutException("Timeout"), None]
+        serial_port_mock.read.return_value = b"0\r\n"
+        with TestSerialPowerSupply(
+            "/dev/ttyUSB0", 9600
+        ) as failed_power_supply, TestSerialPowerSupply(
+            "/dev/ttyUSB0", 9600
+        ) as other_power_supply:
+            with self.assertLogs("labby.hw.core.serial", level="ERROR"):
+                failed_power_supply._write(b":foo;")
+                self.assertEqual(
+                    other_power_supply.get_mode(), PowerSupplyMode.CONSTANT_VOLTAGE
+                )
+                with self.assertRaises(SerialTimeoutException):
+                    failed_power_supply.flush()
+
+    def test_devices_on_the_same_port_share_a_lock(self) -> None:
+        power_supply = TestSerialPowerSupply("/dev/ttyUSB0", 9600)
+        self.assertIs(
+            power_supply.lock(), TestSerialPowerSupply("/dev/ttyUSB0", 9600).lock()
+        )
+        self.assertIsNot(
+            power_supply.lock(), TestSerialPowerSupply("/dev/ttyUSB1", 9600).lock()
+        )
+
 
 class SerialControllerTest(TestCase):
+    def _create_serial_controller(
+        self, wait_time_after_write_ms: float = 0.0
+    ) -> SerialController:
+        return SerialController(
+            port="/dev/ttyUSB0",
+            baudrate=9600,
+            bytesize=8,
+            parity="N",
+            stopbits=1,
+            xonxoff=False,
+            timeout_ms=None,
+            wait_time_after_write_ms=wait_time_after_write_ms,
+        )
+
     @fake_serial_port
     def test_device_reuse(self, serial_port_mock: Mock) -> None:
         self.assertEqual(len(SERIAL_CONTROLLERS), 0)
@@ -147,3 +254,110 @@ class SerialControllerTest(TestCase):
             self.assertEqual(len(SERIAL_CONTROLLERS), 1)
 
         self.assertEqual(len(SERIAL_CONTROLLERS), 0)
+
+    @fake_serial_port
+    def test_get_or_create_starts_the_controller(self, _serial_port_mock: Mock) -> None:
+        arguments = dict(
+            port="/dev/ttyUSB0",
+            baudrate=9600,
+            bytesize=8,
+            parity="N",
+            stopbits=1,
+            xonxoff=False,
+            timeout_ms=None,
+            wait_time_after_write_ms=0.0,
+        )
+        serial_controller = SerialController.get_or_create(**arguments)
+        self.assertTrue(serial_controller.is_alive())
+        self.assertIs(SerialController.get_or_create(**arguments), serial_controller)
+        self.assertEqual(serial_controller.num_clients, 2)
+        serial_controller.close()
+        serial_controller.close()
+        self.assertEqual(len(SERIAL_CONTROLLERS), 0)
+
+    @fake_serial_port
+    def test_close_keeps_other_registered_controllers(
+        self, _serial_port_mock: Mock
+    ) -> None:
+        with TestSerialPowerSupply("/dev/ttyUSB0", 9600) as power_supply:
+            other_controller = self._create_serial_controller()
+            SERIAL_CONTROLLERS["/dev/ttyUSB0"] = other_controller
+        self.assertIs(SERIAL_CONTROLLERS.pop("/dev/ttyUSB0"), other_controller)
+        self.assertFalse(power_supply.serial_controller._running)
+
+    @fake_serial_port
+    def test_read_line_is_buffered(self, serial_port_mock: Mock) -> None:
+        serial_controller = self._create_serial_controller()
+        serial_port_mock.read.side_effect = [b"AV1.", b"33\r\nAA0.02\r\nOS1", b""]
+        self.assertEqual(serial_controller._read_line(), b"AV1.33\r\n")
+        self.assertEqual(serial_controller._read_line(), b"AA0.02\r\n")
+        self.assertEqual(serial_controller._read_line(), b"OS1")
+        self.assertEqual(serial_port_mock.read.call_count, 3)
+
+    @fake_serial_port
+    def test_queued_writes_are_coalesced(self, _serial_port_mock: Mock) -> None:
+        serial_controller = self._create_serial_controller()
+        writes = [
+            SerialControllerJob(type=SerialControllerJobType.WRITE, message=message)
+            for message in (b":VOL1.000;", b":CUR001.00;")
+        ]
+        query = SerialControllerJob(
+            type=SerialControllerJobType.QUERY, message=b":VOL?;"
+        )
+        for job in writes + [query]:
+            serial_controller._enqueue(job)
+
+        job = serial_controller._dequeue()
+        self.assertEqual(serial_controller._coalesce_writes(job), writes)
+        self.assertIs(serial_controller._dequeue_nowait(), query)
+        self.assertIsNone(serial_controller._dequeue_nowait())
+
+    @fake_serial_port
+    def test_spaced_writes_are_not_coalesced(self, _serial_port_mock: Mock) -> None:
+        serial_controller = self._create_serial_controller(
+            wait_time_after_write_ms=50.0
+        )
+        writes = [
+            SerialControllerJob(type=SerialControllerJobType.WRITE, message=message)
+            for message in (b":VOL1.000;", b":CUR001.00;")
+        ]
+        for job in writes:
+            serial_controller._enqueue(job)
+
+        job = serial_controller._dequeue()
+        self.assertEqual(serial_controller._coalesce_writes(job), [writes[0]])
+        self.assertIs(serial_controller._dequeue_nowait(), writes[1])
+
+    @fake_serial_port
+    def test_high_priority_jobs_go_first(self, _serial_port_mock: Mock) -> None:
+        serial_controller = self._create_serial_controller()
+        low = SerialControllerJob(type=SerialControllerJobType.QUERY)
+        high = SerialControllerJob(
+            type=SerialControllerJobType.QUERY,
+            priority=SerialControllerJobPriority.HIGH,
+        )
+        serial_controller._enqueue(low)
+        serial_controller._enqueue(high)
+
+        self.assertIs(serial_controller._dequeue(), high)
+        self.assertIs(serial_controller._dequeue(), low)
+
+    @fake_serial_port
+    def test_writes_are_spaced_by_wait_time(self, serial_port_mock: Mock) -> None:
+        serial_controller = self._create_serial_controller(
+            wait_time_after_write_ms=50.0
+        )
+        with patch("time.monotonic", return_value=100.0) as monotonic, patch(
+            "time.sleep"
+        ) as sleep:
+            serial_controller._write(b":OUT1;")
+            sleep.assert_not_called()
+
+            serial_controller._write(b":OUT0;")
+            sleep.assert_called_once()
+            self.assertAlmostEqual(sleep.call_args[0][0], 0.05)
+
+            monotonic.return_value = 101.0
+            sleep.reset_mock()
+            serial_controller._write(b":OUT1;")
+            sleep.assert_not_called()
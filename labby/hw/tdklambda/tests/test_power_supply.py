@@ -50,6 +50,7 @@ class ZUPTest(TestCase):
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
             power_supply.set_target_voltage(4.25)
+            power_supply.flush()
             serial_port_mock.write.assert_called_once_with(b":VOL4.250;")
 
     @fake_serial_port
@@ -57,13 +58,14 @@ class ZUPTest(TestCase):
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
             power_supply.set_target_current(1.23)
+            power_supply.flush()
             serial_port_mock.write.assert_called_once_with(b":CUR001.23;")
 
     @fake_serial_port
     def test_get_model(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"FOOBAR\r\n"
+            serial_port_mock.read.return_value = b"FOOBAR\r\n"
             returned_model = power_supply.get_model()
             serial_port_mock.write.assert_called_once_with(b":MDL?;")
             self.assertEqual(returned_model, "FOOBAR")
@@ -72,7 +74,7 @@ class ZUPTest(TestCase):
     def test_get_software_version(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"V4.2.0\r\n"
+            serial_port_mock.read.return_value = b"V4.2.0\r\n"
             returned_version = power_supply.get_software_version()
             serial_port_mock.write.assert_called_once_with(b":REV?;")
             self.assertEqual(returned_version, "V4.2.0")
@@ -81,12 +83,12 @@ class ZUPTest(TestCase):
     def test_is_output_on(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"OT1\r\n"
+            serial_port_mock.read.return_value = b"OT1\r\n"
             self.assertTrue(power_supply.is_output_on())
             serial_port_mock.write.assert_called_once_with(b":OUT?;")
 
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"OT0\r\n"
+            serial_port_mock.read.return_value = b"OT0\r\n"
             self.assertFalse(power_supply.is_output_on())
             serial_port_mock.write.assert_called_once_with(b":OUT?;")
 
@@ -95,17 +97,19 @@ class ZUPTest(TestCase):
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
             power_supply.set_output_on(True)
+            power_supply.flush()
             serial_port_mock.write.assert_called_once_with(b":OUT1;")
 
             serial_port_mock.reset_mock()
             power_supply.set_output_on(False)
+            power_supply.flush()
             serial_port_mock.write.assert_called_once_with(b":OUT0;")
 
     @fake_serial_port
     def test_get_target_voltage(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"SV1.42\r\n"
+            serial_port_mock.read.return_value = b"SV1.42\r\n"
             returned_target_voltage = power_supply.get_target_voltage()
             serial_port_mock.write.assert_called_once_with(b":VOL!;")
             self.assertAlmostEqual(returned_target_voltage, 1.42)
@@ -114,7 +118,7 @@ class ZUPTest(TestCase):
     def test_get_target_current(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"SA0.01\r\n"
+            serial_port_mock.read.return_value = b"SA0.01\r\n"
             returned_target_current = power_supply.get_target_current()
             serial_port_mock.write.assert_called_once_with(b":CUR!;")
             self.assertAlmostEqual(returned_target_current, 0.01)
@@ -123,7 +127,7 @@ class ZUPTest(TestCase):
     def test_get_actual_voltage(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"AV1.33\r\n"
+            serial_port_mock.read.return_value = b"AV1.33\r\n"
             returned_actual_voltage = power_supply.get_actual_voltage()
             serial_port_mock.write.assert_called_once_with(b":VOL?;")
             self.assertAlmostEqual(returned_actual_voltage, 1.33)
@@ -132,7 +136,7 @@ class ZUPTest(TestCase):
     def test_get_actual_current(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"AA0.02\r\n"
+            serial_port_mock.read.return_value = b"AA0.02\r\n"
             returned_actual_current = power_supply.get_actual_current()
             serial_port_mock.write.assert_called_once_with(b":CUR?;")
             self.assertAlmostEqual(returned_actual_current, 0.02)
@@ -141,7 +145,7 @@ class ZUPTest(TestCase):
     def test_get_mode(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
             serial_port_mock.reset_mock()
-            serial_port_mock.readline.return_value = b"OS100000000"
+            serial_port_mock.read.side_effect = [b"OS100000000", b""]
             returned_mode = power_supply.get_mode()
             serial_port_mock.write.assert_called_once_with(b":STA?;")
             self.assertEqual(returned_mode, PowerSupplyMode.CONSTANT_CURRENT)
@@ -149,6 +153,6 @@ class ZUPTest(TestCase):
     @fake_serial_port
     def test_invalid_response(self, serial_port_mock: Mock) -> None:
         with tdklambda_power_supply.ZUP("/dev/ttyUSB0", 9600) as power_supply:
-            serial_port_mock.readline.return_value = b"foobar\r\n"
+            serial_port_mock.read.return_value = b"foobar\r\n"
             with self.assertRaisesRegex(HardwareIOError, "Could not parse response"):
                 power_supply.get_actual_voltage()
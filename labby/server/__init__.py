@@ -1,30 +1,38 @@
+import asyncio
 import copy
 import os
 import sys
 import threading
-from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from functools import cached_property
 from typing import (
+    ClassVar,
     Dict,
     Generic,
     Optional,
+    Tuple,
     Type,
     TypeVar,
     Union,
     cast,
 )
 
-from mashumaro import DataClassMessagePackMixin
-from mashumaro.serializer.msgpack import EncodedData
-from pynng import Rep0
+import msgspec
+from pynng import Context, Rep0
 
 from labby.config import Config
 from labby.experiment.runner import ExperimentSequenceStatus
 from labby.server.logging import logger
+from labby.utils.msgpack import decode, encode
 from labby.utils.typing import get_args
 
 
 DEFAULT_ADDRESS = "tcp://127.0.0.1:14337"
+MAX_CONCURRENT_REQUESTS = 8
+# halting has no payload, so clients send this single byte instead of a
+# HaltRequest envelope. it can't be mistaken for one, since envelopes are
+# always encoded as msgpack arrays
+HALT_MESSAGE = b"\x00"
 
 
 @dataclass(frozen=True)
@@ -34,8 +42,9 @@ class ServerInfo:
     pid: int
 
 
-@dataclass(frozen=True)
-class ServerResponseComponent(DataClassMessagePackMixin, ABC):
+# messages never reference themselves, so there's no need for the garbage
+# collector to track them
+class ServerResponseComponent(msgspec.Struct, frozen=True, gc=False):
     pass
 
 
@@ -44,51 +53,67 @@ ServerResponse = ServerResponseComponent
 
 TResponse = TypeVar("TResponse", bound=Union[None, ServerResponse])
 TNonOptionalResponse = TypeVar("TResponse", bound=ServerResponse)
-_ALL_REQUEST_TYPES: Dict[str, Type["ServerRequest[ServerResponse]"]] = {}
+_ALL_REQUEST_TYPES: Dict[bytes, Type["ServerRequest[ServerResponse]"]] = {}
+# requests are sent as a [request_type, request] msgpack array, so the request
+# itself is only decoded once its type is known. the request type is sent as
+# bytes so it can be looked up without decoding it
+RequestEnvelope = Tuple[bytes, msgspec.Raw]
 
 
-@dataclass(frozen=True)
-class ServerRequest(Generic[TResponse], DataClassMessagePackMixin, ABC):
+class ServerRequest(msgspec.Struct, Generic[TResponse], frozen=True, gc=False):
+    _NAME: ClassVar[bytes]
+    _RESPONSE_TYPE: ClassVar[Type[object]]
+
     def __init_subclass__(cls: Type[object]) -> None:
         subclass = cast(Type["ServerRequest[ServerResponse]"], cls)
-        _ALL_REQUEST_TYPES[subclass.__name__] = subclass
+        # these are constant per request type, so there's no need to compute
+        # them for every message
+        subclass._NAME = subclass.__name__.encode()
+        _ALL_REQUEST_TYPES[subclass._NAME] = subclass
+        # pyre-ignore[16]: pyre does not understand __orig_bases__
+        subclass._RESPONSE_TYPE = get_args(subclass.__orig_bases__[0])[0]
         super().__init_subclass__()
 
     def get_response_type(cls) -> TResponse:
-        # pyre-ignore[16]: pyre does not understand __orig_bases__
-        return get_args(cls.__orig_bases__[0])[0]
+        # pyre-ignore[7]: the response type is only known at runtime
+        return cls._RESPONSE_TYPE
+
+    def to_envelope(self) -> bytes:
+        return encode((self._NAME, self))
 
     @classmethod
-    def handle_from_msgpack(
-        cls, server: "Server", msg: EncodedData
-    ) -> Optional[EncodedData]:
-        (request_type, msg) = cast(bytes, msg).split(b":", 1)
-        logger.info(f"Received request {request_type.decode()}")
-        klass = _ALL_REQUEST_TYPES[request_type.decode()]
-        request = klass.from_msgpack(msg)
+    def handle_from_msgpack(cls, server: "Server", msg: bytes) -> Optional[bytes]:
+        if msg == HALT_MESSAGE:
+            server.stop()
+            return None
+        (request_type, payload) = decode(msg, RequestEnvelope)
+        klass = _ALL_REQUEST_TYPES[request_type]
+        logger.info(f"Received request {klass.__name__}")
+        request = decode(payload, klass)
         response = request.handle(server)
         logger.debug(f"Prepared response of type {type(response).__name__}")
         if response is None:
             return None
-        return response.to_msgpack()
+        return encode(response)
 
-    @abstractmethod
     def handle(self, server: "Server") -> TResponse:
         raise NotImplementedError
 
 
 class Server:
+    address: str
     config: Config
     _experiment_sequence_status_lock: threading.Lock
     _experiment_sequence_status: Optional[ExperimentSequenceStatus]
 
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, address: str = DEFAULT_ADDRESS) -> None:
+        self.address = address
         self.config = config
         self._experiment_sequence_status = None
         self._experiment_sequence_status_lock = threading.Lock()
 
     def start(self) -> ServerInfo:
-        address = DEFAULT_ADDRESS
+        address = self.address
 
         existing_pid = self.get_existing_pid()
         if existing_pid:
@@ -100,11 +125,18 @@ class Server:
             self._create_pid_file(child_pid)
             return ServerInfo(address=address, existing=False, pid=child_pid)
 
-        with Rep0(listen=address) as rep:
-            self._run(rep)
-
+        try:
+            asyncio.run(self._run(self._listen_socket))
+        finally:
+            self._listen_socket.close()
         sys.exit(0)
 
+    @cached_property
+    def _listen_socket(self) -> Rep0:
+        # created lazily on the child process, and only once, so the socket is
+        # never bound twice to the same address
+        return Rep0(listen=self.address)
+
     def stop(self) -> None:
         logger.info(f"Stopping server (pid: {os.getpid()})")
         sys.exit(0)
@@ -139,15 +171,46 @@ class Server:
         with self._experiment_sequence_status_lock:
             return copy.deepcopy(self._experiment_sequence_status)
 
-    def _run(self, socket: Rep0) -> None:
+    async def _run(self, socket: Rep0) -> None:
+        # each context handles one request at a time, so a slow request (e.g.
+        # one waiting on a device) doesn't hold up the others
+        workers = [
+            asyncio.ensure_future(self._serve(socket.new_context()))
+            for _ in range(MAX_CONCURRENT_REQUESTS)
+        ]
+        try:
+            done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_COMPLETED)
+            for worker in done:
+                # workers only return when asked to stop, anything else they
+                # raise must bring the server down
+                worker.result()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._delete_pid_file()
+
+    async def _serve(self, context: Context) -> None:
+        loop = asyncio.get_running_loop()
         try:
             while True:
                 logger.info("Waiting for requests...")
-                message = socket.recv()
-                response = ServerRequest.handle_from_msgpack(self, message)
+                message = await context.arecv()
+                try:
+                    response = await loop.run_in_executor(
+                        None, ServerRequest.handle_from_msgpack, self, message
+                    )
+                except SystemExit:
+                    # the server was asked to stop, which brings down the
+                    # other workers too
+                    return
+                except Exception:
+                    # a bad request shouldn't take down the whole server
+                    logger.exception("Failed to handle request")
+                    continue
                 if response is not None:
                     logger.debug("Sending response back to client")
-                    socket.send(response)
+                    await context.asend(response)
                     logger.debug("Sent response")
         finally:
-            self._delete_pid_file()
+            context.close()
@@ -1,4 +1,3 @@
-from dataclasses import dataclass
 from typing import Optional
 
 from labby.hw.core import Device, DeviceType
@@ -6,7 +5,6 @@ from labby.hw.core.power_supply import PowerSupply, PowerSupplyMode
 from labby.server import Server, ServerRequest, ServerResponse, ServerResponseComponent
 
 
-@dataclass(frozen=True)
 class PowerSupplyInfo(ServerResponseComponent):
     is_output_on: bool
     mode: PowerSupplyMode
@@ -16,7 +14,6 @@ class PowerSupplyInfo(ServerResponseComponent):
     actual_current: float
 
 
-@dataclass(frozen=True)
 class DeviceInfoResponse(ServerResponse):
     device_type: Optional[DeviceType]
     is_connected: bool
@@ -25,7 +22,6 @@ class DeviceInfoResponse(ServerResponse):
     power_supply_info: Optional[PowerSupplyInfo] = None
 
 
-@dataclass(frozen=True)
 class DeviceInfoRequest(ServerRequest[DeviceInfoResponse]):
     device_name: str
 
@@ -55,26 +51,24 @@ class DeviceInfoRequest(ServerRequest[DeviceInfoResponse]):
     def handle(self, server: Server) -> DeviceInfoResponse:
         config = server.config
 
-        try:
-            device = next(
-                device for device in config.devices if device.name == self.device_name
-            )
-        except StopIteration:
+        device = config.devices_by_name.get(self.device_name)
+        if device is None:
             return DeviceInfoResponse(device_type=None, is_connected=False)
 
-        try:
-            device.open()
-            device_info = self._get_device_info(device)
-            is_connected = True
-            error_type = None
-            error_message = None
-        except Exception as ex:
-            device_info = None
-            error_type = type(ex).__name__
-            error_message = str(ex)
-            is_connected = False
-        finally:
-            device.close()
+        with device.lock():
+            try:
+                device.open()
+                device_info = self._get_device_info(device)
+                is_connected = True
+                error_type = None
+                error_message = None
+            except Exception as ex:
+                device_info = None
+                error_type = type(ex).__name__
+                error_message = str(ex)
+                is_connected = False
+            finally:
+                device.close()
 
         return DeviceInfoResponse(
             device_type=device.device_type,
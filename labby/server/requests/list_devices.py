@@ -1,11 +1,11 @@
-from dataclasses import dataclass
-from typing import Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
 
 from labby.hw.core import Device
+from labby.hw.core.serial import SerialDevice
 from labby.server import Server, ServerRequest, ServerResponse, ServerResponseComponent
 
 
-@dataclass(frozen=True)
 class DeviceStatus(ServerResponseComponent):
     name: str
     is_available: bool
@@ -13,31 +13,51 @@ class DeviceStatus(ServerResponseComponent):
     error_message: Optional[str] = None
 
 
-@dataclass(frozen=True)
 class ListDevicesResponse(ServerResponse):
     devices: Sequence[DeviceStatus]
 
 
-@dataclass(frozen=True)
 class ListDevicesRequest(ServerRequest[ListDevicesResponse]):
     def _get_device_status(self, device: Device) -> DeviceStatus:
-        try:
-            device.open()
-            device.test_connection()
-            return DeviceStatus(name=str(device.name), is_available=True)
-        except Exception as ex:
-            return DeviceStatus(
-                name=str(device.name),
-                is_available=False,
-                error_type=type(ex).__name__,
-                error_message=str(ex),
-            )
-        finally:
-            device.close()
+        with device.lock():
+            try:
+                device.open()
+                device.test_connection()
+                return DeviceStatus(name=str(device.name), is_available=True)
+            except Exception as ex:
+                return DeviceStatus(
+                    name=str(device.name),
+                    is_available=False,
+                    error_type=type(ex).__name__,
+                    error_message=str(ex),
+                )
+            finally:
+                device.close()
+
+    def _get_device_statuses(self, devices: Sequence[Device]) -> List[DeviceStatus]:
+        return [self._get_device_status(device) for device in devices]
 
     def handle(self, server: "Server") -> ListDevicesResponse:
+        devices = server.config.devices
+        if not devices:
+            return ListDevicesResponse(devices=[])
+
+        # devices on the same serial port can only be used one at a time (see
+        # SerialDevice.lock), so each port's devices are probed in order
+        # instead of having threads wait on each other
+        devices_by_port: Dict[object, List[Device]] = {}
+        for device in devices:
+            port = device.port if isinstance(device, SerialDevice) else device
+            devices_by_port.setdefault(port, []).append(device)
+        port_devices = list(devices_by_port.values())
+
+        # probing a device mostly waits on I/O, so probe all ports at once
+        status_by_device: Dict[Device, DeviceStatus] = {}
+        with ThreadPoolExecutor(max_workers=min(32, len(port_devices))) as executor:
+            for group, statuses in zip(
+                port_devices, executor.map(self._get_device_statuses, port_devices)
+            ):
+                status_by_device.update(zip(group, statuses))
         return ListDevicesResponse(
-            devices=[
-                self._get_device_status(device) for device in server.config.devices
-            ]
+            devices=[status_by_device[device] for device in devices]
         )
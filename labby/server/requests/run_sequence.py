@@ -1,6 +1,5 @@
 import threading
 import time
-from dataclasses import dataclass
 
 from pynng import Sub0
 
@@ -8,17 +7,16 @@ from labby.experiment.runner import ExperimentRunner, ExperimentSequenceStatus
 from labby.experiment.sequence import ExperimentSequence
 from labby.server import Server, ServerRequest
 from labby.utils import auto_discover_experiments
+from labby.utils.msgpack import decode
 
 
-@dataclass(frozen=True)
 class RunSequenceRequest(ServerRequest[None]):
     sequence_filename: str
 
     def handle(self, server: Server) -> None:
         auto_discover_experiments()
 
-        with open(self.sequence_filename, "r") as sequence_fd:
-            sequence = ExperimentSequence(self.sequence_filename, sequence_fd.read())
+        sequence = ExperimentSequence.from_file(self.sequence_filename)
 
         runner = ExperimentRunner(server.config, sequence)
         monitor = ExperimentMonitor(server, sequence, runner.subscription_address)
@@ -51,7 +49,7 @@ class ExperimentMonitor(threading.Thread):
             for index, experiment in enumerate(self.sequence.experiments):
                 while True:
                     msg = sub.recv()
-                    sequence_status = ExperimentSequenceStatus.from_msgpack(msg)
+                    sequence_status = decode(msg, ExperimentSequenceStatus)
                     self.server.set_experiment_sequence_status(sequence_status)
                     if sequence_status.experiments[index].is_finished():
                         break
@@ -80,8 +80,11 @@ class TestExperiment(Experiment[InputParameters, OutputData]):
         power_supply.close()
 
 
+_ANSI_RE: "re.Pattern[str]" = re.compile(r"\x1b\[[0-9;]*[mGK]")
+
+
 def _strip_colors(output: str) -> str:
-    return re.sub(r"\x1b[0-9;[]+[mGK]", "", output)
+    return _ANSI_RE.sub("", output)
 
 
 class CommandLineTest(TestCase):
@@ -1,15 +1,19 @@
+import os
+import tempfile
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
+
 
 from labby.config import Config
 from labby.hw import tdklambda
-from labby.tests.utils import fake_serial_port
-from labby.utils import auto_discover_drivers
+from labby.hw.virtual.power_supply import PowerSupply
+from labby.tests.utils import environment_variable, fake_serial_port
+from labby.utils.yaml import load_yaml_as_strings
 
 
 class ConfigTest(TestCase):
     def setUp(self) -> None:
-        auto_discover_drivers()
+        Config.clear_cache()
 
     @fake_serial_port
     def test_basic_config(self, _serial_port_mock: Mock) -> None:
@@ -34,3 +38,128 @@ devices:
         self.assertEqual(device.port, "/dev/ttyUSB0")
         self.assertEqual(device.baudrate, 9600)
         self.assertEqual(device.address, 1)
+
+    @fake_serial_port
+    def test_args_are_converted_from_strings(self, _serial_port_mock: Mock) -> None:
+        config = Config(
+            """
+---
+devices:
+  - name: "zup-6-132"
+    type: power_supply
+    driver: labby.hw.tdklambda.power_supply.ZUP
+    args:
+      port: /dev/ttyUSB0
+      baudrate: 9600
+      address: 010
+        """
+        )
+        device = config.devices[0]
+        assert isinstance(device, tdklambda.power_supply.ZUP)
+        self.assertEqual(device.address, 10)
+
+    def test_parsed_configs_are_reused(self) -> None:
+        contents = VIRTUAL_CONFIG_YAML.format(load_in_ohms="5.0")
+        with patch(
+            "labby.config.load_yaml_as_strings", wraps=load_yaml_as_strings
+        ) as load_mock:
+            first_config = Config(contents)
+            second_config = Config(contents)
+        load_mock.assert_called_once()
+        self.assertEqual(first_config.config, second_config.config)
+        self.assertIsNot(first_config.config, second_config.config)
+        self.assertIsNot(first_config.devices[0], second_config.devices[0])
+
+    def test_bytes_config(self) -> None:
+        config = Config(VIRTUAL_CONFIG_YAML.format(load_in_ohms="5.0").encode())
+        device = config.devices[0]
+        assert isinstance(device, PowerSupply)
+        self.assertEqual(device.load_in_ohms, 5.0)
+
+    def test_invalid_config(self) -> None:
+        for contents in (
+            "devices: foo",
+            "devices: []\nfoo: bar",
+            VIRTUAL_CONFIG_YAML.format(load_in_ohms="5").replace(
+                "power_supply\n", "oscilloscope\n"
+            ),
+            VIRTUAL_CONFIG_YAML.format(load_in_ohms="5").replace(
+                "    type:", "    kind:"
+            ),
+        ):
+            with self.subTest(contents=contents), self.assertRaises(ValueError):
+                Config(contents)
+
+    def test_devices_by_name(self) -> None:
+        config = Config(
+            """
+---
+devices:
+  - name: "first"
+    type: power_supply
+    driver: labby.hw.virtual.power_supply.PowerSupply
+    args:
+      load_in_ohms: 1
+  - name: "second"
+    type: power_supply
+    driver: labby.hw.virtual.power_supply.PowerSupply
+    args:
+      load_in_ohms: 2
+        """
+        )
+        self.assertEqual(config.devices_by_name.keys(), {"first", "second"})
+        self.assertIs(config.devices_by_name["second"], config.devices[1])
+
+
+VIRTUAL_CONFIG_YAML = """
+---
+devices:
+  - name: "virtual-power-supply"
+    type: power_supply
+    driver: labby.hw.virtual.power_supply.PowerSupply
+    args:
+      load_in_ohms: {load_in_ohms}
+"""
+
+
+class ConfigCacheTest(TestCase):
+    def setUp(self) -> None:
+        Config.clear_cache()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "labby.yml")
+
+    def _write_config(self, load_in_ohms: str) -> None:
+        with open(self.filename, "w") as config_file:
+            config_file.write(VIRTUAL_CONFIG_YAML.format(load_in_ohms=load_in_ohms))
+
+    def _get_load_in_ohms(self, config: Config) -> float:
+        device = config.devices[0]
+        assert isinstance(device, PowerSupply)
+        return device.load_in_ohms
+
+    def test_parsed_config_is_cached(self) -> None:
+        self._write_config("5.0")
+        with patch(
+            "labby.config.load_yaml_as_strings", wraps=load_yaml_as_strings
+        ) as load_mock:
+            first_config = Config.from_file(self.filename)
+            second_config = Config.from_file(self.filename)
+        load_mock.assert_called_once()
+        self.assertTrue(os.path.exists(f"{self.filename}.cache.pkl"))
+        self.assertEqual(self._get_load_in_ohms(first_config), 5.0)
+        self.assertEqual(self._get_load_in_ohms(second_config), 5.0)
+        self.assertIsNot(first_config.devices[0], second_config.devices[0])
+
+    def test_cache_is_invalidated_when_config_changes(self) -> None:
+        self._write_config("5.0")
+        Config.from_file(self.filename)
+        self._write_config("10.0")
+        config = Config.from_file(self.filename)
+        self.assertEqual(self._get_load_in_ohms(config), 10.0)
+
+    def test_cache_can_be_disabled(self) -> None:
+        self._write_config("5.0")
+        with environment_variable("LABBY_CONFIG_CACHE", "0"):
+            Config.from_file(self.filename)
+        self.assertFalse(os.path.exists(f"{self.filename}.cache.pkl"))
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from pathlib import PosixPath
 from typing import List
 from unittest import TestCase
-from unittest.mock import call, patch
+from unittest.mock import patch
 
 from pynng import Sub0
 
@@ -20,7 +20,7 @@ from labby.experiment.runner import (
     ExperimentStatus,
 )
 from labby.tests.utils import patch_file_contents, patch_time
-from labby.utils import auto_discover_drivers
+from labby.utils.msgpack import decode
 
 
 @dataclass(frozen=True)
@@ -72,9 +72,6 @@ sequence:
 
 
 class ExperimentRunnerTest(TestCase):
-    def setUp(self) -> None:
-        auto_discover_drivers()
-
     def test_output_data_type_metadata(self) -> None:
         input_parameters = InputParameters()
         experiment = TestExperiment("test_experiment", input_parameters)
@@ -87,20 +84,14 @@ class ExperimentRunnerTest(TestCase):
         runner = ExperimentRunner(config, sequence)
 
         with patch_time("2020-08-08"), patch_file_contents(
-            "output/seq/000.csv"
+            "output/seq/000.csv", record=True
         ) as output, patch("os.makedirs") as makedirs:
             runner.start()
             runner.join()
 
         makedirs.assert_called_with(PosixPath("output/seq/"), exist_ok=True)
-        self.assertEqual(len(output.write.call_args_list), 4)
-        output.write.assert_has_calls(
-            [
-                call("seconds,voltage\n"),
-                call("0.0,15.0\n"),
-                call("0.5,15.0\n"),
-                call("1.0,15.0\n"),
-            ]
+        output.write.assert_called_once_with(
+            "seconds,voltage\n0.0,15.0\n0.5,15.0\n1.0,15.0\n"
         )
 
     def test_published_messages(self) -> None:
@@ -118,7 +109,7 @@ class ExperimentRunnerTest(TestCase):
                 runner.start()
                 while True:
                     msg = sub.recv()
-                    status = ExperimentSequenceStatus.from_msgpack(msg)
+                    status = decode(msg, ExperimentSequenceStatus)
                     received_messages.append(status)
                     if status.is_finished():
                         break
@@ -1,14 +1,15 @@
+import asyncio
+import gc
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import PosixPath
-from typing import cast
-from unittest import TestCase
-from unittest.mock import MagicMock, call, patch
+from typing import List
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, MagicMock, Mock, call, patch
 
-from mashumaro.serializer.msgpack import EncodedData
-
-from labby.client import Client
+from labby.client import AsyncClient, Client, list_devices_from_all
 from labby.config import Config
 from labby.experiment import (
     BaseInputParameters,
@@ -17,12 +18,25 @@ from labby.experiment import (
 )
 from labby.hw.core import DeviceType
 from labby.hw.core.power_supply import PowerSupplyMode
-from labby.server import Server, ServerRequest
-from labby.server.requests.device_info import DeviceInfoResponse, PowerSupplyInfo
+from labby.server import (
+    DEFAULT_ADDRESS,
+    HALT_MESSAGE,
+    MAX_CONCURRENT_REQUESTS,
+    Server,
+    ServerRequest,
+)
+from labby.server.requests.device_info import (
+    DeviceInfoRequest,
+    DeviceInfoResponse,
+    PowerSupplyInfo,
+)
 from labby.server.requests.halt import HaltRequest
-from labby.server.requests.list_devices import DeviceStatus, ListDevicesResponse
-from labby.tests.utils import patch_file_contents, patch_time
-from labby.utils import auto_discover_drivers
+from labby.server.requests.list_devices import (
+    DeviceStatus,
+    ListDevicesRequest,
+    ListDevicesResponse,
+)
+from labby.tests.utils import fake_serial_port, patch_file_contents, patch_time
 
 
 FAKE_PID = 42
@@ -57,7 +71,8 @@ class ServerTest(TestCase):
             self.assertFalse(server_info.existing)
             self.assertEqual(server_info.pid, FAKE_PID)
             makedirs.assert_called_with(".labby", exist_ok=True)
-            pidfile.write.assert_called_once_with(str(FAKE_PID))
+            self.assertEqual(pidfile.contents, str(FAKE_PID))
+            self.assertEqual(server_info.address, DEFAULT_ADDRESS)
 
     @patch("os.fork", return_value=0)
     @patch("os.makedirs")
@@ -72,15 +87,62 @@ class ServerTest(TestCase):
     ) -> None:
         config = Config(LABBY_CONFIG_YAML)
         with patch_file_contents(".labby/pid"):
-            rep0_mock.return_value.__enter__.return_value.recv.return_value = (
-                b"HaltRequest:" + cast(bytes, HaltRequest().to_msgpack())
-            )
+            context_mock = rep0_mock.return_value.new_context
+            context_mock.return_value.arecv = AsyncMock(return_value=HALT_MESSAGE)
 
             server = Server(config)
             with self.assertRaises(SystemExit):
                 server.start()
+        rep0_mock.assert_called_once_with(listen=DEFAULT_ADDRESS)
+        rep0_mock.return_value.close.assert_called_once_with()
         remove_mock.assert_called_once_with(".labby/pid")
 
+    def _run_with_messages(self, server: Server, messages: List[bytes]) -> None:
+        async def _arecv() -> bytes:
+            return messages.pop(0)
+
+        async def _wait_forever() -> bytes:
+            await asyncio.Event().wait()
+            return b""
+
+        # only the first worker gets the messages, so they are handled in order
+        contexts = [MagicMock(arecv=_arecv)] + [
+            MagicMock(arecv=_wait_forever) for _ in range(MAX_CONCURRENT_REQUESTS - 1)
+        ]
+        socket = MagicMock()
+        socket.new_context.side_effect = contexts
+        with patch.object(server, "_delete_pid_file") as delete_pid_file:
+            asyncio.run(server._run(socket))
+        delete_pid_file.assert_called_once_with()
+
+    def test_malformed_message(self) -> None:
+        server = Server(Config(LABBY_CONFIG_YAML))
+        with self.assertLogs("labby", level="ERROR") as logs:
+            self._run_with_messages(server, [b"garbage", HALT_MESSAGE])
+        self.assertIn("Failed to handle request", logs.output[0])
+
+    def test_worker_errors_are_raised(self) -> None:
+        server = Server(Config(LABBY_CONFIG_YAML))
+        # running out of messages makes the first worker fail outside of a request
+        with self.assertRaises(IndexError):
+            self._run_with_messages(server, [])
+
+    def test_halt_request_envelope(self) -> None:
+        server = Server(Config(LABBY_CONFIG_YAML))
+        with self.assertRaises(SystemExit):
+            ServerRequest.handle_from_msgpack(server, HaltRequest().to_envelope())
+
+    def test_request_type_metadata(self) -> None:
+        self.assertEqual(HaltRequest._NAME, b"HaltRequest")
+        self.assertIs(HaltRequest._RESPONSE_TYPE, type(None))
+        self.assertEqual(DeviceInfoRequest._NAME, b"DeviceInfoRequest")
+        self.assertIs(DeviceInfoRequest._RESPONSE_TYPE, DeviceInfoResponse)
+
+    def test_messages_are_compact(self) -> None:
+        for message in (HaltRequest(), DeviceStatus(name="psu", is_available=True)):
+            self.assertFalse(hasattr(message, "__dict__"))
+            self.assertFalse(gc.is_tracked(message))
+
     def test_existing_pid(self) -> None:
         config = Config(LABBY_CONFIG_YAML)
         with patch_file_contents(".labby/pid", "12345"):
@@ -90,6 +152,81 @@ class ServerTest(TestCase):
             self.assertEqual(server_info.pid, 12345)
 
 
+ZUPS_ON_SHARED_PORT_YAML = """
+---
+devices:
+  - name: "zup-1"
+    type: power_supply
+    driver: labby.hw.tdklambda.power_supply.ZUP
+    args:
+      port: "/dev/ttyUSB0"
+      baudrate: 9600
+      address: 1
+  - name: "zup-2"
+    type: power_supply
+    driver: labby.hw.tdklambda.power_supply.ZUP
+    args:
+      port: "/dev/ttyUSB0"
+      baudrate: 9600
+      address: 2
+"""
+
+
+class ListDevicesRequestTest(TestCase):
+    @fake_serial_port
+    def test_devices_on_the_same_port_are_probed_one_at_a_time(
+        self, serial_port_mock: Mock
+    ) -> None:
+        serial_port_mock.read.return_value = b"Nemic-Lambda ZUP(6V-132A)\r\n"
+        server = Server(Config(ZUPS_ON_SHARED_PORT_YAML))
+        response = ListDevicesRequest().handle(server)
+        self.assertEqual(
+            response,
+            ListDevicesResponse(
+                devices=[
+                    DeviceStatus(name="zup-1", is_available=True),
+                    DeviceStatus(name="zup-2", is_available=True),
+                ]
+            ),
+        )
+        self.assertEqual(
+            serial_port_mock.write.call_args_list,
+            [
+                call(b":ADR01;"),
+                call(b":MDL?;"),
+                call(b":ADR02;"),
+                call(b":MDL?;"),
+            ],
+        )
+
+
+class DeviceInfoRequestTest(TestCase):
+    @fake_serial_port
+    def test_devices_on_the_same_port_are_used_one_at_a_time(
+        self, serial_port_mock: Mock
+    ) -> None:
+        serial_port_mock.read.return_value = b"Nemic-Lambda ZUP(6V-132A)\r\n"
+        server = Server(Config(ZUPS_ON_SHARED_PORT_YAML))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(
+                executor.map(
+                    lambda name: DeviceInfoRequest(device_name=name).handle(server),
+                    ["zup-1", "zup-2"],
+                )
+            )
+        self.assertEqual(
+            [response.device_type for response in responses],
+            [DeviceType.POWER_SUPPLY] * 2,
+        )
+        writes = [args[0] for args, _ in serial_port_mock.write.call_args_list]
+        # each device's writes must all go out before the other's
+        half = len(writes) // 2
+        self.assertEqual(
+            sorted([writes[:half], writes[half:]]),
+            [[b":ADR01;"] + writes[1:half], [b":ADR02;"] + writes[1:half]],
+        )
+
+
 @dataclass(frozen=True)
 class OutputData(BaseOutputData):
     voltage: float
@@ -121,6 +258,19 @@ class TestExperiment(Experiment[InputParameters, OutputData]):
         power_supply.close()
 
 
+EXPECTED_LIST_DEVICES_RESPONSE = ListDevicesResponse(
+    devices=[
+        DeviceStatus(name="virtual-power-supply", is_available=True),
+        DeviceStatus(
+            name="broken-power-supply",
+            is_available=False,
+            error_type="Exception",
+            error_message="Unavailable device",
+        ),
+    ]
+)
+
+
 class ClientTest(TestCase):
     # pyre-ignore[24]: Generic type `unittest.mock._patch` expects 1 type parameter
     req_patch: unittest.mock._patch
@@ -128,11 +278,10 @@ class ClientTest(TestCase):
     client: Client
 
     def setUp(self) -> None:
-        auto_discover_drivers()
         config: Config = Config(LABBY_CONFIG_YAML)
         server: Server = Server(config)
 
-        def _handle(msg: EncodedData) -> None:
+        def _handle(msg: bytes) -> None:
             response_bytes = ServerRequest.handle_from_msgpack(server, msg)
             self.req_mock.return_value.recv.return_value = response_bytes
 
@@ -148,6 +297,7 @@ class ClientTest(TestCase):
     def test_halt(self) -> None:
         with self.assertRaises(SystemExit):
             self.client.halt()
+        self.req_mock.return_value.send.assert_called_once_with(HALT_MESSAGE)
 
     def test_close(self) -> None:
         self.client.close()
@@ -159,20 +309,7 @@ class ClientTest(TestCase):
 
     def test_list_devices(self) -> None:
         response = self.client.list_devices()
-        self.assertEqual(
-            response,
-            ListDevicesResponse(
-                devices=[
-                    DeviceStatus(name="virtual-power-supply", is_available=True),
-                    DeviceStatus(
-                        name="broken-power-supply",
-                        is_available=False,
-                        error_type="Exception",
-                        error_message="Unavailable device",
-                    ),
-                ]
-            ),
-        )
+        self.assertEqual(response, EXPECTED_LIST_DEVICES_RESPONSE)
 
     def test_device_info(self) -> None:
         device_info = self.client.device_info("virtual-power-supply")
@@ -220,8 +357,10 @@ sequence:
 """
         with patch_file_contents(
             "sequence/test.yml", SEQUENCE_CONTENTS
-        ), patch_file_contents("output/test/000.csv") as output_0, patch_file_contents(
-            "output/test/001.csv"
+        ), patch_file_contents(
+            "output/test/000.csv", record=True
+        ) as output_0, patch_file_contents(
+            "output/test/001.csv", record=True
         ) as output_1, patch(
             "os.makedirs"
         ) as makedirs, patch_time(
@@ -235,20 +374,56 @@ sequence:
                 time.sleep(0)
 
             makedirs.assert_called_with(PosixPath("output/test/"), exist_ok=True)
-            self.assertEqual(len(output_0.write.call_args_list), 4)
-            output_0.write.assert_has_calls(
-                [
-                    call("seconds,voltage\n"),
-                    call("0.0,15.0\n"),
-                    call("0.5,15.0\n"),
-                    call("1.0,15.0\n"),
-                ]
-            )
-            output_1.write.assert_has_calls(
-                [
-                    call("seconds,voltage\n"),
-                    call("0.0,15.0\n"),
-                    call("0.5,15.0\n"),
-                    call("1.0,15.0\n"),
-                ]
-            )
+            for output in (output_0, output_1):
+                output.write.assert_called_once_with(
+                    "seconds,voltage\n0.0,15.0\n0.5,15.0\n1.0,15.0\n"
+                )
+
+
+class AsyncClientTest(IsolatedAsyncioTestCase):
+    # pyre-ignore[24]: Generic type `unittest.mock._patch` expects 1 type parameter
+    req_patch: unittest.mock._patch
+    req_mock: MagicMock
+
+    def setUp(self) -> None:
+        config: Config = Config(LABBY_CONFIG_YAML)
+        server: Server = Server(config)
+
+        self.req_patch = patch("labby.client.Req0")
+        self.req_mock = self.req_patch.start()
+
+        def _create_req(**kwargs: object) -> MagicMock:
+            req = MagicMock()
+
+            async def _handle(msg: bytes) -> None:
+                response_bytes = ServerRequest.handle_from_msgpack(server, msg)
+                req.arecv = AsyncMock(return_value=response_bytes)
+
+            req.asend = AsyncMock(side_effect=_handle)
+            return req
+
+        self.req_mock.side_effect = _create_req
+
+    def tearDown(self) -> None:
+        self.req_patch.stop()
+
+    async def test_hello(self) -> None:
+        client = AsyncClient("foobar")
+        self.assertEqual(await client.hello(), "Hello world")
+
+    async def test_list_devices(self) -> None:
+        client = AsyncClient("foobar")
+        self.assertEqual(await client.list_devices(), EXPECTED_LIST_DEVICES_RESPONSE)
+
+    async def test_list_devices_from_all(self) -> None:
+        clients = [AsyncClient("foo"), AsyncClient("bar")]
+        responses = await list_devices_from_all(clients)
+        self.assertEqual(responses, [EXPECTED_LIST_DEVICES_RESPONSE] * 2)
+        for client in clients:
+            client.req.asend.assert_awaited_once()
+            client.req.arecv.assert_awaited_once()
+
+    async def test_halt(self) -> None:
+        client = AsyncClient("foobar")
+        with self.assertRaises(SystemExit):
+            await client.halt()
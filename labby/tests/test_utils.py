@@ -1,8 +1,11 @@
 import time
-from typing import Generator
+from typing import Dict, Generator, List
 from unittest import TestCase
 
-from labby.tests.utils import patch_time
+from labby.hw.core.drivers import DRIVER_MODULES
+from labby.tests.utils import patch_file_contents, patch_time
+from labby.utils import find_driver_modules
+from labby.utils.cache import memoize_copies
 
 
 class UtilsTest(TestCase):
@@ -66,3 +69,50 @@ class UtilsTest(TestCase):
             time.sleep(3600.0)
             self.assertEqual(state, "end_state")
             self.assertEqual(self._current_time(), "Sat Aug  8 01:00:02 2020")
+
+    def test_patch_file_contents(self) -> None:
+        with patch_file_contents("foo.txt", "foo") as foo_file:
+            with open("foo.txt", "r") as fd:
+                self.assertEqual(fd.read(), "foo")
+            with open("foo.txt", "a") as fd:
+                fd.write("bar")
+            self.assertEqual(foo_file.contents, "foobar")
+            with open("foo.txt", "w") as fd:
+                fd.write("baz")
+            self.assertEqual(foo_file.contents, "baz")
+
+    def test_patch_file_contents_with_record(self) -> None:
+        with patch_file_contents("foo.txt", record=True) as foo_file:
+            with open("foo.txt", "w") as fd:
+                fd.write("foo")
+            foo_file.write.assert_called_once_with("foo")
+
+
+class DriverModulesTest(TestCase):
+    def test_driver_modules_are_up_to_date(self) -> None:
+        driver_modules = {
+            module
+            for module in find_driver_modules()
+            if not module.startswith("labby.hw.core.")
+        }
+        self.assertEqual(set(DRIVER_MODULES), driver_modules)
+
+
+class MemoizeCopiesTest(TestCase):
+    def test_results_are_reused_as_copies(self) -> None:
+        calls: List[str] = []
+
+        @memoize_copies(maxsize=1)
+        def _parse(contents: str) -> Dict[str, str]:
+            calls.append(contents)
+            return {"contents": contents}
+
+        first = _parse("foo")
+        second = _parse("foo")
+        self.assertEqual(calls, ["foo"])
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+        _parse.cache_clear()
+        _parse("foo")
+        self.assertEqual(calls, ["foo", "foo"])
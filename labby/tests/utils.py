@@ -4,7 +4,18 @@ from builtins import open as open_orig
 from contextlib import contextmanager, redirect_stderr, redirect_stdout
 from datetime import timedelta
 from time import sleep as sleep_orig
-from typing import Callable, Dict, Generator, Iterator, List, Optional, Tuple, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from unittest.mock import patch, mock_open, MagicMock, Mock
 
 import freezegun
@@ -23,23 +34,57 @@ def cli_arguments(arguments: List[str]) -> Iterator[None]:
         yield
 
 
+class _InMemoryFileHandle(io.StringIO):
+    def __init__(self, file: "InMemoryFile", mode: str) -> None:
+        super().__init__("" if "w" in mode else file.contents)
+        self.file = file
+        self.mode = mode
+        if "a" in mode:
+            self.seek(0, io.SEEK_END)
+
+    def close(self) -> None:
+        if not self.closed and self.mode != "r":
+            self.file.contents = self.getvalue()
+        super().close()
+
+
+class InMemoryFile:
+    contents: str
+
+    def __init__(self, contents: str) -> None:
+        self.contents = contents
+
+    def open(self, mode: str = "r") -> Union[io.StringIO, io.BytesIO]:
+        if "b" in mode:
+            assert mode == "rb", "binary files can only be read"
+            return io.BytesIO(self.contents.encode())
+        return _InMemoryFileHandle(self, mode)
+
+
 class _OpenMockFileStore:
-    filename_to_mock: Dict[str, MagicMock] = {}
+    filename_to_file: Dict[str, Union[InMemoryFile, MagicMock]] = {}
 
-    def register(self, filename: str, contents: Optional[str]) -> None:
-        assert filename not in self.filename_to_mock.keys()
-        mock = mock_open(read_data=contents)
-        self.filename_to_mock[filename] = mock()
+    def register(self, filename: str, contents: Optional[str], record: bool) -> None:
+        assert filename not in self.filename_to_file.keys()
+        if record:
+            self.filename_to_file[filename] = mock_open(read_data=contents)()
+        else:
+            self.filename_to_file[filename] = InMemoryFile(contents or "")
 
     def unregister(self, filename: str) -> None:
-        assert filename in self.filename_to_mock.keys()
-        del self.filename_to_mock[filename]
+        assert filename in self.filename_to_file.keys()
+        del self.filename_to_file[filename]
 
-    def open(self, filename: str, *args: object, **kwargs: object) -> MagicMock:
+    def open(
+        self, filename: str, mode: str = "r", *args: object, **kwargs: object
+    ) -> Union[io.StringIO, io.BytesIO, MagicMock]:
         filename = str(filename)
-        if filename not in self.filename_to_mock.keys():
-            return open_orig(filename, *args, **kwargs)
-        return self.filename_to_mock[filename]
+        file = self.filename_to_file.get(filename)
+        if file is None:
+            return open_orig(filename, mode, *args, **kwargs)
+        if isinstance(file, InMemoryFile):
+            return file.open(mode)
+        return file
 
 
 OPEN_MOCK_FILE_STORE = _OpenMockFileStore()
@@ -47,12 +92,14 @@ OPEN_MOCK_FILE_STORE = _OpenMockFileStore()
 
 @contextmanager
 def patch_file_contents(
-    filename: str, contents: Optional[str] = None
-) -> Iterator[MagicMock]:
-    OPEN_MOCK_FILE_STORE.register(filename, contents)
+    filename: str, contents: Optional[str] = None, record: bool = False
+) -> Iterator[Any]:
+    # files are kept in memory by default, since recording every call on a
+    # MagicMock is slow. use record=True for tests that assert on the calls
+    OPEN_MOCK_FILE_STORE.register(filename, contents, record)
     try:
         with patch("builtins.open", OPEN_MOCK_FILE_STORE.open):
-            yield OPEN_MOCK_FILE_STORE.filename_to_mock[filename]
+            yield OPEN_MOCK_FILE_STORE.filename_to_file[filename]
     finally:
         OPEN_MOCK_FILE_STORE.unregister(filename)
 
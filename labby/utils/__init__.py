@@ -1,13 +1,35 @@
+import os
+from functools import lru_cache
 from importlib import import_module
 from pathlib import Path
+from typing import List, Sequence
 
+from labby.hw.core.drivers import DRIVER_MODULES
 
-def auto_discover_drivers() -> None:
+
+def find_driver_modules() -> List[str]:
     HW_PATH = Path(__file__).parent.parent / "hw"
+    modules = []
     for f in HW_PATH.glob("**/*.py"):
         if "__" in f.stem or "test" in f.stem or f.parent.stem == "hw":
             continue
-        import_module(f"labby.hw.{f.parent.stem}.{f.stem}", __package__)
+        modules.append(f"labby.hw.{f.parent.stem}.{f.stem}")
+    return modules
+
+
+# Device.create imports drivers on demand, so this is only needed to import
+# every driver upfront (e.g. to list them all)
+@lru_cache(maxsize=None)
+def auto_discover_drivers() -> None:
+    # walking the filesystem is slow on some hosts, so only do it when
+    # explicitly asked to (e.g. while developing a new driver)
+    modules: Sequence[str] = (
+        find_driver_modules()
+        if os.environ.get("LABBY_DISCOVER") == "1"
+        else DRIVER_MODULES
+    )
+    for module in modules:
+        import_module(module, __package__)
 
 
 def auto_discover_experiments() -> None:
@@ -0,0 +1,75 @@
+import copy
+import os
+from functools import lru_cache
+from typing import Any, Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+FileVersion = Tuple[int, int]
+
+
+def _get_file_version(filename: str) -> Optional[FileVersion]:
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_with_cache(
+    filename: str,
+    parse: Callable[[bytes], T],
+    cache_filename: str,
+    dumps: Callable[[Tuple[FileVersion, T]], bytes],
+    loads: Callable[[bytes], Any],
+    enabled: bool = True,
+) -> T:
+    # parsing is slow, so keep the parsed contents next to the file and reuse
+    # them for as long as the file doesn't change
+    file_version = _get_file_version(filename) if enabled else None
+
+    if file_version is not None:
+        try:
+            with open(cache_filename, "rb") as cache_file:
+                (cached_version, data) = loads(cache_file.read())
+            if tuple(cached_version) == file_version:
+                return data
+        except Exception:
+            # a missing or unreadable cache is simply rebuilt
+            pass
+
+    with open(filename, "rb") as fd:
+        data = parse(fd.read())
+
+    if file_version is not None:
+        try:
+            # dumping first, so nothing is written if the data can't be cached
+            cache_contents = dumps((file_version, data))
+            with open(cache_filename, "wb") as cache_file:
+                cache_file.write(cache_contents)
+        except (OSError, TypeError):
+            pass
+
+    return data
+
+
+class MemoizedCopies(Generic[K, T]):
+    def __init__(self, func: Callable[[K], T], maxsize: int) -> None:
+        self._cached_func: Callable[[K], T] = lru_cache(maxsize=maxsize)(func)
+
+    def __call__(self, key: K) -> T:
+        # callers get their own copy so they can't mutate what is in the cache
+        return copy.deepcopy(self._cached_func(key))
+
+    def cache_clear(self) -> None:
+        # pyre-ignore[16]: the cached function is wrapped by lru_cache
+        self._cached_func.cache_clear()
+
+
+def memoize_copies(maxsize: int) -> Callable[[Callable[[K], T]], MemoizedCopies[K, T]]:
+    def decorator(func: Callable[[K], T]) -> MemoizedCopies[K, T]:
+        return MemoizedCopies(func, maxsize)
+
+    return decorator
@@ -0,0 +1,24 @@
+from typing import Any, Dict, Type, TypeVar, Union
+
+import msgspec
+
+
+T = TypeVar("T")
+
+ENCODER = msgspec.msgpack.Encoder()
+_DECODERS: Dict[Any, msgspec.msgpack.Decoder] = {}
+
+
+def encode(obj: object) -> bytes:
+    return ENCODER.encode(obj)
+
+
+def decode(data: Union[bytes, msgspec.Raw], type: Type[T]) -> T:
+    # decoders are built lazily since they can only be created once the type
+    # is fully defined
+    try:
+        decoder = _DECODERS[type]
+    except KeyError:
+        decoder = msgspec.msgpack.Decoder(type)
+        _DECODERS[type] = decoder
+    return decoder.decode(data)
@@ -0,0 +1,24 @@
+from typing import Dict, List, Pattern, Tuple, Union
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    # pyre-ignore[9]: libyaml is not available, fallback to the pure-python loader
+    from yaml import SafeLoader as _Loader
+
+
+class _StringLoader(_Loader):
+    # without implicit resolvers every plain scalar is loaded as a string, so
+    # callers decide how to convert it (e.g. `010` isn't read as octal)
+    yaml_implicit_resolvers: Dict[str, List[Tuple[str, Pattern[str]]]] = {}
+
+
+def load_yaml(contents: Union[bytes, str]) -> object:
+    # libyaml reads bytes directly, so files don't need to be decoded first
+    return yaml.load(contents, Loader=_Loader)
+
+
+def load_yaml_as_strings(contents: Union[bytes, str]) -> object:
+    return yaml.load(contents, Loader=_StringLoader)